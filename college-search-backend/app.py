@@ -2,9 +2,14 @@
 Main Flask application for College Search Backend
 """
 import os
-from flask import Flask, jsonify
+import hashlib
+import hmac
+from flask import Flask, jsonify, request
 from flask_cors import CORS
+from flask_compress import Compress
 from dotenv import load_dotenv
+from cache import cache, init_cache
+from json_provider import OrjsonProvider
 
 # Import routes
 from routes_schools import schools_bp
@@ -17,6 +22,7 @@ load_dotenv()
 
 # Create Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Configure CORS
 cors_origins = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
@@ -24,7 +30,10 @@ CORS(app, resources={
     r"/api/*": {
         "origins": cors_origins,
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization"],
+        # Let browsers cache preflight responses instead of sending an
+        # OPTIONS request before every API call (Chrome caps this at 2h)
+        "max_age": 86400
     }
 })
 
@@ -32,6 +41,25 @@ CORS(app, resources={
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['JSON_SORT_KEYS'] = False
 
+# Configure caching
+init_cache(app)
+
+# Compress JSON responses (brotli for browsers that accept it, gzip otherwise)
+app.config.update(
+    COMPRESS_ALGORITHM=['br', 'gzip'],
+    COMPRESS_LEVEL=4,
+    COMPRESS_BR_LEVEL=4,
+    COMPRESS_MIN_SIZE=500,
+    COMPRESS_MIMETYPES=['application/json']
+)
+Compress(app)
+
+# Responses larger than this are not hashed for ETags
+ETAG_MAX_BODY_SIZE = 1024 * 1024
+# Read-only analytics data can be reused by browsers and CDNs for a while
+ANALYTICS_CACHE_CONTROL = 'public, max-age=300, stale-while-revalidate=3600'
+ANALYTICS_PREFIXES = ('/api/analytics/', '/api/aggregations/')
+
 # Register blueprints
 app.register_blueprint(schools_bp)
 app.register_blueprint(programs_bp)
@@ -39,6 +67,24 @@ app.register_blueprint(aggregations_bp)
 app.register_blueprint(analytics_bp)
 
 
+@app.after_request
+def add_conditional_headers(response):
+    """Tag GET responses with a content ETag and answer If-None-Match with 304"""
+    if (request.method != 'GET' or response.status_code != 200
+            or response.is_streamed or response.direct_passthrough):
+        return response
+
+    body = response.get_data()
+    if len(body) > ETAG_MAX_BODY_SIZE:
+        return response
+
+    response.set_etag(hashlib.blake2b(body, digest_size=16).hexdigest())
+    if request.path.startswith(ANALYTICS_PREFIXES):
+        response.headers.setdefault('Cache-Control', ANALYTICS_CACHE_CONTROL)
+
+    return response.make_conditional(request)
+
+
 @app.route('/')
 def index():
     """Health check endpoint"""
@@ -98,7 +144,8 @@ def api_docs():
                 'GET /api/aggregations/roi': 'Calculate ROI metrics',
                 'GET /api/aggregations/earnings-distribution': 'Get earnings distribution',
                 'GET /api/aggregations/cost-vs-earnings': 'Get cost vs earnings data',
-                'GET /api/aggregations/completion-rates': 'Get completion rate statistics'
+                'GET /api/aggregations/completion-rates': 'Get completion rate statistics',
+                'GET /api/aggregations/dashboard': 'Get ROI, earnings, cost vs earnings and completion data in one call'
             },
             'analytics': {
                 'GET /api/analytics/state/<state_code>': 'Get comprehensive state analytics',
@@ -111,6 +158,22 @@ def api_docs():
     })
 
 
+@app.route('/api/cache/flush', methods=['POST'])
+def flush_cache():
+    """
+    Drop cached responses and query results after a data refresh (jobs.py)
+    Requires `Authorization: Bearer $CACHE_FLUSH_TOKEN`; disabled when the token is unset.
+    With the in-process backend this only clears the worker that handles the request.
+    """
+    token = os.getenv('CACHE_FLUSH_TOKEN')
+    supplied = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(supplied, f'Bearer {token}'):
+        return jsonify({'error': 'Forbidden'}), 403
+
+    cache.clear()
+    return jsonify({'status': 'flushed'}), 200
+
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
@@ -123,6 +186,7 @@ def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 
+# Development server only; production runs under gunicorn (see gunicorn.conf.py)
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
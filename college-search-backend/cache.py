@@ -0,0 +1,37 @@
+"""
+Response and query caching shared by the API routes and models
+"""
+import os
+from flask_caching import Cache
+
+# Reference data (states, CIP codes, years) changes only when the dataset is reloaded
+REFERENCE_TIMEOUT = 3600
+# Aggregation responses: the same filter combinations repeat across dashboard reloads
+AGGREGATION_TIMEOUT = 300
+
+cache = Cache()
+
+
+def init_cache(app):
+    """Configure the cache backend: Redis when REDIS_URL is set, in-process otherwise"""
+    config = {
+        'CACHE_DEFAULT_TIMEOUT': int(os.getenv('CACHE_DEFAULT_TIMEOUT', 3600))
+    }
+
+    redis_url = os.getenv('REDIS_URL')
+    if redis_url:
+        config['CACHE_TYPE'] = 'RedisCache'
+        config['CACHE_REDIS_URL'] = redis_url
+    else:
+        config['CACHE_TYPE'] = 'SimpleCache'
+        # The default of 500 entries is exhausted by the per-school list entries and
+        # memoized filter pages, evicting the short-lived aggregation responses
+        config['CACHE_THRESHOLD'] = int(os.getenv('CACHE_THRESHOLD', 20000))
+
+    cache.init_app(app, config=config)
+
+
+def is_ok_response(rv):
+    """Only cache successful responses so errors are retried on the next request"""
+    status = rv[1] if isinstance(rv, tuple) else getattr(rv, 'status_code', 200)
+    return status == 200
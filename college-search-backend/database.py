@@ -2,18 +2,115 @@
 Database connection and utilities for MongoDB
 """
 import os
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo import MongoClient, IndexModel, ReadPreference, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import ConnectionFailure, OperationFailure
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Leading school.state index; also hinted by SchoolModel.count_by_state for a covered scan
+SCHOOL_STATE_INDEX = [('school.state', ASCENDING), ('school.ownership', ASCENDING), ('school.name', ASCENDING)]
+
+# costs_aid_completion keys hinted by CostsAidCompletionModel.match_hint for
+# the leading $match of the aggregation routes
+COSTS_YEAR_SCHOOL_INDEX = [('year', ASCENDING), ('school_id', ASCENDING)]
+COSTS_YEAR_STATE_INDEX = [('year', ASCENDING), ('school_state', ASCENDING), ('school_ownership', ASCENDING)]
+COSTS_YEAR_EARNINGS_INDEX = [('year', ASCENDING), ('earnings.10_yrs_after_entry.median', ASCENDING)]
+
+# Sort-supporting index keys for filter_schools; SchoolModel hints these by key
+SORT_INDEXES = {
+    'latest.student.size': [('latest.student.size', DESCENDING), ('school_id', DESCENDING)],
+    'school.name': [('school.name', ASCENDING), ('school_id', ASCENDING)],
+    'latest.cost.tuition.in_state': [('latest.cost.tuition.in_state', DESCENDING), ('school_id', DESCENDING)],
+    'latest.earnings.10_yrs_after_entry.median': [('latest.earnings.10_yrs_after_entry.median', DESCENDING), ('school_id', DESCENDING)],
+    'latest.admissions.admission_rate.overall': [('latest.admissions.admission_rate.overall', DESCENDING), ('school_id', DESCENDING)],
+    'latest.completion.completion_rate_4yr_150nt': [('latest.completion.completion_rate_4yr_150nt', DESCENDING), ('school_id', DESCENDING)],
+}
+# Default size sort under a single state or ownership filter
+FILTERED_SIZE_INDEXES = {
+    'school.state': [('school.state', ASCENDING), ('latest.student.size', DESCENDING), ('school_id', DESCENDING)],
+    'school.ownership': [('school.ownership', ASCENDING), ('latest.student.size', DESCENDING), ('school_id', DESCENDING)],
+}
+
+# filter_schools query shapes, shared by schools and its school_summary copy
+# (equality fields first, then sort fields, then range fields)
+LIST_VIEW_INDEXES = [
+    IndexModel([('school_id', ASCENDING)], unique=True),
+    IndexModel(SCHOOL_STATE_INDEX),
+    IndexModel([('school.state', ASCENDING), ('latest.cost.avg_net_price.overall', ASCENDING)]),
+    IndexModel([('school.state', ASCENDING), ('latest.earnings.10_yrs_after_entry.median', DESCENDING)]),
+    # filter_schools default sort (size) under the common state/ownership filters
+    *[IndexModel(keys) for keys in FILTERED_SIZE_INDEXES.values()],
+    # One per SORT_FIELD_MAP path (with the school_id tiebreaker) for unfiltered listings
+    *[IndexModel(keys) for keys in SORT_INDEXES.values()],
+]
+
+# Indexes backing the query shapes used by models.py and the route pipelines
+INDEXES = {
+    'schools': LIST_VIEW_INDEXES + [
+        IndexModel([('school.name', TEXT)]),
+        # Anchored prefix search for autocomplete
+        IndexModel([('school.name_lower', ASCENDING)]),
+    ],
+    'school_summary': LIST_VIEW_INDEXES,
+    'academics_programs': [
+        IndexModel([('school_id', ASCENDING), ('year', DESCENDING)]),
+        # Major filters: one multikey index over the tall program_shares array
+        # (written by jobs.py), and a wildcard index for the wide original fields
+        IndexModel([('year', ASCENDING), ('program_shares.major', ASCENDING), ('program_shares.pct', ASCENDING)]),
+        IndexModel([('academics.program_percentage.$**', ASCENDING)]),
+    ],
+    'costs_aid_completion': [
+        IndexModel([('school_id', ASCENDING), ('year', DESCENDING)]),
+        IndexModel(COSTS_YEAR_STATE_INDEX),
+        # Aggregation first stages: year + resolved school_id $in lists, and
+        # year + the earnings floor of with_cost_and_earnings (cost is an $ifNull
+        # expression over several paths, which no index can serve)
+        IndexModel(COSTS_YEAR_SCHOOL_INDEX),
+        IndexModel(COSTS_YEAR_EARNINGS_INDEX),
+        IndexModel([('year', ASCENDING), ('completion.completion_rate_4yr_150nt', ASCENDING)]),
+        # State analytics leaderboards: sort + $limit 10 walk these and stop early
+        IndexModel([('year', ASCENDING), ('school_state', ASCENDING), ('earnings.10_yrs_after_entry.median', DESCENDING)]),
+        IndexModel([('year', ASCENDING), ('school_state', ASCENDING), ('completion.completion_rate_4yr_150nt', DESCENDING)]),
+    ],
+    'programs_field_of_study': [
+        IndexModel([('school_id', ASCENDING), ('year', DESCENDING)]),
+        IndexModel([('programs.cip_code', ASCENDING), ('year', ASCENDING)]),
+    ],
+    'admissions_student': [
+        IndexModel([('school_id', ASCENDING), ('year', DESCENDING)]),
+    ],
+    # Written by jobs.refresh_roi; $out keeps these across refreshes
+    'roi_materialized': [
+        IndexModel([('year', ASCENDING), ('state', ASCENDING), ('ownership', ASCENDING), ('roi_10yr', DESCENDING)]),
+        IndexModel([('year', ASCENDING), ('ownership', ASCENDING), ('roi_10yr', DESCENDING)]),
+        IndexModel([('year', ASCENDING), ('roi_10yr', DESCENDING)]),
+        IndexModel([('year', ASCENDING), ('school_id', ASCENDING)]),
+    ],
+    'program_trends_cache': [
+        IndexModel([('cip_code', ASCENDING), ('year', ASCENDING)]),
+    ],
+}
+
+# Collections touched at worker start so the first requests find warm sockets
+WARMUP_COLLECTIONS = [
+    'schools',
+    'academics_programs',
+    'costs_aid_completion',
+    'programs_field_of_study',
+    'admissions_student',
+]
+
 class Database:
     """MongoDB database connection handler"""
     
     _instance = None
     _client = None
     _db = None
+    _analytics_db = None
+    # Collection handles, resolved once per name
+    _collections = {}
+    _analytics_collections = {}
     
     def __new__(cls):
         if cls._instance is None:
@@ -29,16 +126,38 @@ class Database:
         try:
             mongodb_uri = os.getenv('MONGODB_URI')
             database_name = os.getenv('DATABASE_NAME', 'college_scorecard')
-            
+            max_pool_size = int(os.getenv('MONGODB_MAX_POOL_SIZE', 100))
+            min_pool_size = int(os.getenv('MONGODB_MIN_POOL_SIZE', 10))
+            compressors = os.getenv('MONGODB_COMPRESSORS', 'zstd,zlib')
+
             if not mongodb_uri:
                 raise ValueError("MONGODB_URI not found in environment variables")
-            
-            self._client = MongoClient(mongodb_uri)
+
+            # MongoClient is thread-safe: every request thread in a worker
+            # shares this pool, so concurrent requests overlap their I/O waits.
+            # Wire compression shrinks the large BSON documents we read; the
+            # server picks the first compressor in the list it also supports.
+            self._client = MongoClient(
+                mongodb_uri,
+                maxPoolSize=max_pool_size,
+                minPoolSize=min_pool_size,
+                compressors=compressors,
+                zlibCompressionLevel=6,
+                retryReads=True,
+                serverSelectionTimeoutMS=5000
+            )
             self._db = self._client[database_name]
+            # Analytics reads tolerate replication lag, so let them use secondaries
+            self._analytics_db = self._db.with_options(
+                read_preference=ReadPreference.SECONDARY_PREFERRED
+            )
             
             # Test connection
             self._client.admin.command('ping')
             print(f"✓ Successfully connected to MongoDB database: {database_name}")
+
+            if os.getenv('MONGODB_ENSURE_INDEXES', 'true').lower() == 'true':
+                self.ensure_indexes()
             
         except ConnectionFailure as e:
             print(f"✗ Failed to connect to MongoDB: {e}")
@@ -47,6 +166,26 @@ class Database:
             print(f"✗ Error connecting to database: {e}")
             raise
     
+    def ensure_indexes(self):
+        """Create the indexes in INDEXES (no-op for indexes that already exist)"""
+        for collection_name, indexes in INDEXES.items():
+            collection = self._db[collection_name]
+            for index in indexes:
+                # One index per call so a conflicting definition doesn't block the rest
+                try:
+                    collection.create_indexes([index])
+                except OperationFailure as e:
+                    print(f"✗ Could not create index {index.document['name']} on {collection_name}: {e}")
+    
+    def warmup(self):
+        """Issue one cheap read per model collection to open pooled sockets up front"""
+        for collection_name in WARMUP_COLLECTIONS:
+            try:
+                self._db[collection_name].find_one({}, {'_id': 1})
+            except OperationFailure as e:
+                print(f"✗ Warmup read failed on {collection_name}: {e}")
+        print(f"✓ Warmed connection pool ({len(WARMUP_COLLECTIONS)} collections)")
+    
     def get_db(self):
         """Get database instance"""
         if self._db is None:
@@ -55,7 +194,17 @@ class Database:
     
     def get_collection(self, collection_name):
         """Get a specific collection"""
-        return self.get_db()[collection_name]
+        if collection_name not in self._collections:
+            self._collections[collection_name] = self.get_db()[collection_name]
+        return self._collections[collection_name]
+    
+    def get_analytics_collection(self, collection_name):
+        """Get a collection handle that prefers secondaries for heavy analytics reads"""
+        if collection_name not in self._analytics_collections:
+            if self._analytics_db is None:
+                self.connect()
+            self._analytics_collections[collection_name] = self._analytics_db[collection_name]
+        return self._analytics_collections[collection_name]
     
     def close(self):
         """Close database connection"""
@@ -74,3 +223,7 @@ def get_database():
 def get_collection(name):
     """Helper function to get collection"""
     return db_instance.get_collection(name)
+
+def get_analytics_collection(name):
+    """Helper function to get a secondary-preferred collection for analytics"""
+    return db_instance.get_analytics_collection(name)
@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration for the College Search Backend
+
+    gunicorn -c college-search-backend/gunicorn.conf.py app:app
+"""
+import os
+import multiprocessing
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+# Requests spend most of their time waiting on MongoDB, so each worker
+# process runs several threads that share one PyMongo connection pool
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+keepalive = 30
+timeout = 60
+
+# The app connects to MongoDB at import time and MongoClient is not
+# fork-safe, so every worker imports the app itself
+preload_app = False
+
+
+def post_worker_init(worker):
+    """Warm each worker's MongoDB pool before it accepts its first request"""
+    from database import db_instance
+    db_instance.warmup()
@@ -0,0 +1,251 @@
+"""
+Offline data-maintenance jobs for the College Search Backend
+Keeps denormalized fields and pre-computed aggregation collections up to date.
+Run after every dataset load (or nightly via cron):
+
+    python jobs.py
+
+and optionally keep denormalized school fields current in between:
+
+    python jobs.py watch
+"""
+import sys
+from pymongo import UpdateMany
+from database import get_collection
+from models import (CostsAidCompletionModel, SCHOOL_LIST_PROJECTION, SCHOOL_SUMMARY,
+                    STATE_AGGREGATIONS_CACHE, PROGRAM_TRENDS_CACHE,
+                    EARNINGS_DISTRIBUTION_CACHE, COMPLETION_RATES_CACHE, ROI_CACHE,
+                    STATE_COMPARISON_CACHE,
+                    COMPLETION_GROUP_FIELDS, PROGRAM_TRENDS_ACCUMULATORS,
+                    DENORMALIZED_SCHOOL_FIELDS, get_path)
+
+BATCH_SIZE = 1000
+
+
+def school_field_values(doc):
+    """DENORMALIZED_SCHOOL_FIELDS values of a schools document"""
+    return {field: get_path(doc, path) for field, path in DENORMALIZED_SCHOOL_FIELDS.items()}
+
+
+def sync_school_fields():
+    """
+    Copy low-churn school fields onto costs_aid_completion documents so
+    aggregations can group/filter on them without a $lookup into schools
+    """
+    costs = get_collection('costs_aid_completion')
+    projection = {'_id': 0, 'school_id': 1}
+    projection.update({path: 1 for path in DENORMALIZED_SCHOOL_FIELDS.values()})
+    schools = get_collection('schools').find({}, projection).batch_size(BATCH_SIZE)
+
+    operations = []
+    updated = 0
+    for doc in schools:
+        operations.append(UpdateMany(
+            {'school_id': doc['school_id']},
+            {'$set': school_field_values(doc)}
+        ))
+
+        if len(operations) >= BATCH_SIZE:
+            updated += costs.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += costs.bulk_write(operations, ordered=False).modified_count
+
+    print(f"✓ Synced school fields onto {updated} costs_aid_completion documents")
+
+
+def watch_school_fields():
+    """
+    Follow the schools change stream and re-copy the denormalized fields of each
+    changed school onto its costs_aid_completion documents (requires a replica set).
+    Pre-computed collections still refresh on the next full run.
+    """
+    costs = get_collection('costs_aid_completion')
+    pipeline = [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace']}}}]
+
+    print("✓ Watching schools for denormalized field changes")
+    with get_collection('schools').watch(pipeline, full_document='updateLookup') as stream:
+        for change in stream:
+            doc = change.get('fullDocument')
+            # Deleted again before the lookup ran
+            if not doc or 'school_id' not in doc:
+                continue
+            result = costs.update_many({'school_id': doc['school_id']},
+                                       {'$set': school_field_values(doc)})
+            if result.modified_count:
+                print(f"✓ Synced school fields of {doc['school_id']} "
+                      f"onto {result.modified_count} costs_aid_completion documents")
+
+
+def sync_school_name_lower():
+    """Store a lowercased school name so prefix searches can use a plain index"""
+    result = get_collection('schools').update_many(
+        {'school.name': {'$type': 'string'}},
+        [{'$set': {'school.name_lower': {'$toLower': '$school.name'}}}]
+    )
+    print(f"✓ Synced school.name_lower on {result.modified_count} schools")
+
+
+def reshape_program_percentages():
+    """
+    Mirror the wide academics.program_percentage object as a tall
+    program_shares: [{major, pct}] array so one index serves every major
+    """
+    result = get_collection('academics_programs').update_many(
+        {'academics.program_percentage': {'$type': 'object'}},
+        [{'$set': {'program_shares': {
+            '$map': {
+                'input': {'$filter': {
+                    'input': {'$objectToArray': '$academics.program_percentage'},
+                    'cond': {'$ne': ['$$this.v', None]}
+                }},
+                'in': {'major': '$$this.k', 'pct': '$$this.v'}
+            }
+        }}}]
+    )
+    print(f"✓ Reshaped program percentages on {result.modified_count} academics_programs documents")
+
+
+def refresh_school_summary():
+    """Copy the list-view fields of every school into the slim school_summary collection"""
+    pipeline = [
+        {'$project': SCHOOL_LIST_PROJECTION},
+        {'$out': SCHOOL_SUMMARY}
+    ]
+
+    get_collection('schools').aggregate(pipeline, allowDiskUse=True)
+    print(f"✓ Refreshed {SCHOOL_SUMMARY}")
+
+
+def recompute_state_aggregations():
+    """Materialize the state aggregation pipeline into its cache collection"""
+    pipeline = CostsAidCompletionModel.state_aggregations_pipeline()
+    pipeline.append({'$out': STATE_AGGREGATIONS_CACHE})
+
+    get_collection('costs_aid_completion').aggregate(pipeline, allowDiskUse=True)
+    print(f"✓ Recomputed {STATE_AGGREGATIONS_CACHE}")
+
+
+def recompute_state_comparison():
+    """
+    Materialize the per-state comparison of every year into its cache collection
+    Groups on the school fields copied by sync_school_fields, so run after it
+    """
+    costs = get_collection('costs_aid_completion')
+    cache_collection = get_collection(STATE_COMPARISON_CACHE)
+    years = costs.distinct('year')
+    for year in years:
+        pipeline = CostsAidCompletionModel.state_comparison_pipeline(year)
+        cache_collection.replace_one(
+            {'_id': year},
+            {'states': list(costs.aggregate(pipeline, allowDiskUse=True))},
+            upsert=True
+        )
+    print(f"✓ Recomputed {STATE_COMPARISON_CACHE} for {len(years)} years")
+
+
+def refresh_roi():
+    """
+    Materialize the ROI row of every (school_id, year) with usable cost and earnings
+    Reads the school fields copied by sync_school_fields, so run after it
+    """
+    pipeline = [
+        {'$match': CostsAidCompletionModel.usable_cost_and_earnings()},
+        *CostsAidCompletionModel.roi_metric_stages(),
+        {'$project': {
+            **CostsAidCompletionModel.roi_output_projection(),
+            '_id': 0,
+            'year': 1,
+            'size': '$school_size',
+            # Unrounded values for cost-vs-earnings; only the ROI output is rounded
+            'raw_cost': '$roi_cost',
+            'raw_earnings_10yr': '$earnings.10_yrs_after_entry.median',
+            'raw_completion_rate': '$completion.completion_rate_4yr_150nt'
+        }},
+        {'$out': ROI_CACHE}
+    ]
+
+    get_collection('costs_aid_completion').aggregate(pipeline, allowDiskUse=True)
+    print(f"✓ Refreshed {ROI_CACHE}")
+
+
+def recompute_earnings_distribution():
+    """
+    Materialize the unfiltered earnings distribution of every year into its cache collection
+    Reads school_name as copied by sync_school_fields, so run after it
+    """
+    costs = get_collection('costs_aid_completion')
+    cache_collection = get_collection(EARNINGS_DISTRIBUTION_CACHE)
+    years = costs.distinct('year')
+    for year in years:
+        pipeline = CostsAidCompletionModel.earnings_distribution_pipeline({'$match': {'year': year}})
+        cache_collection.replace_one(
+            {'_id': year},
+            {'distribution': list(costs.aggregate(pipeline, allowDiskUse=True))},
+            upsert=True
+        )
+    print(f"✓ Recomputed {EARNINGS_DISTRIBUTION_CACHE} for {len(years)} years")
+
+
+def recompute_completion_rates():
+    """
+    Materialize completion rates of every year and group_by into its cache collection
+    Groups on the school fields copied by sync_school_fields, so run after it
+    """
+    costs = get_collection('costs_aid_completion')
+    cache_collection = get_collection(COMPLETION_RATES_CACHE)
+    years = costs.distinct('year')
+    for year in years:
+        for group_by in COMPLETION_GROUP_FIELDS:
+            pipeline = CostsAidCompletionModel.completion_rates_pipeline(year, group_by)
+            cache_collection.replace_one(
+                {'_id': CostsAidCompletionModel.completion_rates_cache_id(year, group_by)},
+                {'data': list(costs.aggregate(pipeline, allowDiskUse=True))},
+                upsert=True
+            )
+    print(f"✓ Recomputed {COMPLETION_RATES_CACHE} for {len(years)} years")
+
+
+def recompute_program_trends():
+    """Materialize per-(cip_code, year) program earnings into its cache collection"""
+    pipeline = [
+        # Carry only the fields the accumulators read through $unwind
+        {'$project': {
+            'year': 1,
+            'programs.cip_code': 1,
+            'programs.earnings': 1,
+            'programs.debt.median': 1
+        }},
+        {'$unwind': '$programs'},
+        {'$group': {
+            '_id': {'cip_code': '$programs.cip_code', 'year': '$year'},
+            **PROGRAM_TRENDS_ACCUMULATORS
+        }},
+        {'$addFields': {'cip_code': '$_id.cip_code', 'year': '$_id.year'}},
+        {'$out': PROGRAM_TRENDS_CACHE}
+    ]
+
+    get_collection('programs_field_of_study').aggregate(pipeline, allowDiskUse=True)
+    print(f"✓ Recomputed {PROGRAM_TRENDS_CACHE}")
+
+
+def run_all():
+    """Run every job in dependency order"""
+    sync_school_fields()
+    sync_school_name_lower()
+    reshape_program_percentages()
+    refresh_school_summary()
+    recompute_state_aggregations()
+    recompute_state_comparison()
+    refresh_roi()
+    recompute_earnings_distribution()
+    recompute_completion_rates()
+    recompute_program_trends()
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['watch']:
+        watch_school_fields()
+    else:
+        run_all()
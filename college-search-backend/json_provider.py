@@ -0,0 +1,41 @@
+"""
+Fast JSON serialization for API responses, backed by orjson
+"""
+import orjson
+from bson import ObjectId, Decimal128, json_util
+from flask.json.provider import JSONProvider
+
+
+def _default(obj):
+    """Serialize BSON types that orjson does not handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return float(obj.to_decimal())
+    # Dates and the rarer BSON types keep the extended JSON shape ({"$date": ...})
+    # the routes returned when they went through json_util
+    return json_util.default(obj, json_util.RELAXED_JSON_OPTIONS)
+
+
+def dumps_bytes(obj):
+    """Serialize obj straight to JSON bytes"""
+    return orjson.dumps(
+        obj,
+        default=_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    )
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider using orjson for jsonify() and request parsing"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Build the response from bytes directly, skipping the str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype='application/json')
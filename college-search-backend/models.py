@@ -2,8 +2,22 @@
 Data models for college search application
 FIXED VERSION - Updated to match actual MongoDB structure
 """
-from database import get_collection
+import os
+import re
+import logging
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from flask import g, has_request_context
+from pymongo.errors import OperationFailure
+from database import (get_collection, get_analytics_collection, SCHOOL_STATE_INDEX,
+                      SORT_INDEXES, FILTERED_SIZE_INDEXES, COSTS_YEAR_SCHOOL_INDEX,
+                      COSTS_YEAR_STATE_INDEX, COSTS_YEAR_EARNINGS_INDEX)
+from cache import cache
 from bson import ObjectId
+from bson.son import SON
+
+logger = logging.getLogger(__name__)
 
 SORT_FIELD_MAP = {
     "size": "latest.student.size",
@@ -14,6 +28,14 @@ SORT_FIELD_MAP = {
     "completion_rate": "latest.completion.completion_rate_4yr_150nt",
 }
 
+# (sort_by, sort_order) -> (sort field, direction), resolved in a single lookup
+SORT_SPEC = MappingProxyType({
+    (sort_by, order): (field, 1 if order == 'asc' else -1)
+    for sort_by, field in SORT_FIELD_MAP.items()
+    for order in ('asc', 'desc')
+})
+DEFAULT_SORT = SORT_SPEC[('size', 'desc')]
+
 # Projection dictionaries for efficient queries
 SCHOOL_LIST_PROJECTION = {
     'school_id': 1,
@@ -37,11 +59,65 @@ SCHOOL_LIST_PROJECTION = {
     'latest.repayment.3_yr_default_rate': 1,
 }
 
+# Autocomplete-style queries (a few plain words) use an indexed prefix match
+# on school.name_lower (maintained by jobs.py) before falling back to $text
+PREFIX_SEARCH_MAX_TOKENS = 3
+PREFIX_SEARCH_PATTERN = re.compile(r"^[\w\s&'.,-]+$")
+
+# Normalized list-view school docs are cached per school_id for this long
+SCHOOL_CACHE_TIMEOUT = 3600
+
+# Filter name -> (document path, query operator) for filter_schools
+FILTER_FIELD_MAP = {
+    'state': ('school.state', '$eq'),
+    'ownership': ('school.ownership', '$eq'),
+    'degree_level': ('school.degrees_awarded.predominant', '$eq'),
+    'school_ids': ('school_id', '$in'),
+    'cost_min': ('latest.cost.avg_net_price.overall', '$gte'),
+    'cost_max': ('latest.cost.avg_net_price.overall', '$lte'),
+    'earnings_min': ('latest.earnings.10_yrs_after_entry.median', '$gte'),
+    'earnings_max': ('latest.earnings.10_yrs_after_entry.median', '$lte'),
+}
+
+# Flattened `latest` key -> candidate paths under `latest`, in priority order
+NORMALIZE_PATHS = (
+    ('avg_net_price', (
+        ('cost', 'avg_net_price', 'overall'),
+        ('cost', 'avg_net_price', 'public'),
+        ('cost', 'avg_net_price', 'private'),
+        ('cost', 'tuition', 'in_state'),
+    )),
+    ('admission_rate', (('admissions', 'admission_rate', 'overall'),)),
+    ('sat_avg', (('admissions', 'sat_scores', 'average', 'overall'),)),
+    ('act_avg', (('admissions', 'act_scores', 'midpoint', 'cumulative'),)),
+    ('size', (('student', 'size'),)),
+    ('tuition_in_state', (('cost', 'tuition', 'in_state'),)),
+    ('tuition_out_of_state', (('cost', 'tuition', 'out_of_state'),)),
+    ('completion_rate_4yr', (('completion', 'completion_rate_4yr_150nt'),)),
+    ('completion_rate_overall', (('completion', 'rate_suppressed', 'four_year'),)),
+    ('median_earnings_10yr', (('earnings', '10_yrs_after_entry', 'median'),)),
+    ('median_earnings_6yr', (('earnings', '6_yrs_after_entry', 'median'),)),
+    ('pell_grant_rate', (('aid', 'pell_grant_rate'),)),
+    ('median_debt', (
+        ('aid', 'median_debt', 'completers', 'overall'),
+        ('aid', 'median_debt'),
+    )),
+    ('default_rate_3yr', (('repayment', '3_yr_default_rate'),)),
+)
+
+# Detail view: every `latest` subtree the detail page and normalize_school_doc
+# read, leaving out the large latest.academics and latest.programs subtrees
 SCHOOL_DETAIL_PROJECTION = {
     'school_id': 1,
     'school': 1,
     'location': 1,
-    'latest': 1,
+    'latest.student': 1,
+    'latest.admissions': 1,
+    'latest.cost': 1,
+    'latest.completion': 1,
+    'latest.earnings': 1,
+    'latest.aid': 1,
+    'latest.repayment': 1,
 }
 
 COSTS_AID_PROJECTION = {
@@ -68,167 +144,557 @@ ADMISSIONS_PROJECTION = {
 }
 
 
+# Large school_id lists are split into $in chunks of this size and queried in parallel
+IN_QUERY_CHUNK_SIZE = 500
+IN_QUERY_MAX_WORKERS = 4
+
+# Request-path aggregations fail fast rather than pile up on the server
+AGGREGATION_MAX_TIME_MS = int(os.getenv('AGGREGATION_MAX_TIME_MS', 15000))
+
+# Explain output fields that describe the server rather than the plan
+EXPLAIN_NOISE_FIELDS = ('command', 'serverInfo', 'serverParameters', 'ok', '$clusterTime', 'operationTime')
+EXPLAIN_STAT_FIELDS = ('nReturned', 'executionTimeMillis', 'totalKeysExamined', 'totalDocsExamined')
+
+# Pre-computed collections refreshed by jobs.py
+SCHOOL_SUMMARY = 'school_summary'
+STATE_AGGREGATIONS_CACHE = 'state_aggregations_cache'
+PROGRAM_TRENDS_CACHE = 'program_trends_cache'
+EARNINGS_DISTRIBUTION_CACHE = 'earnings_distribution_cache'
+COMPLETION_RATES_CACHE = 'completion_rates_cache'
+STATE_COMPARISON_CACHE = 'state_comparison_cache'
+ROI_CACHE = 'roi_materialized'
+
+# Fields of ROI_CACHE rows returned by the roi and cost-vs-earnings endpoints.
+# Rows carry the rounded ROI output plus the unrounded raw_* values the scatter returns.
+ROI_RESULT_PROJECTION = {
+    '_id': 0,
+    'year': 0,
+    'size': 0,
+    'raw_cost': 0,
+    'raw_earnings_10yr': 0,
+    'raw_completion_rate': 0
+}
+COST_VS_EARNINGS_PROJECTION = {
+    '_id': 0,
+    'school_id': 1,
+    'school_name': 1,
+    'state': 1,
+    'ownership': 1,
+    'cost': '$raw_cost',
+    'earnings': '$raw_earnings_10yr',
+    'completion_rate': '$raw_completion_rate',
+    'size': 1
+}
+
+EARNINGS_BUCKETS = [0, 30000, 40000, 50000, 60000, 70000, 80000, 100000, 150000, 200000, 500000]
+# Highest-earning schools listed per bucket (the count covers the rest)
+EARNINGS_BUCKET_SCHOOLS = 25
+
+# academics.program_percentage keys (the accepted `major` values) -> display names
+MAJOR_NAMES = {
+    'agriculture': 'Agriculture',
+    'resources': 'Natural Resources',
+    'architecture': 'Architecture',
+    'ethnic_cultural_gender': 'Ethnic, Cultural & Gender Studies',
+    'communication': 'Communication',
+    'communications_technology': 'Communications Technology',
+    'computer': 'Computer Science',
+    'personal_culinary': 'Personal & Culinary Services',
+    'education': 'Education',
+    'engineering': 'Engineering',
+    'engineering_technology': 'Engineering Technology',
+    'language': 'Foreign Languages',
+    'family_consumer_science': 'Family & Consumer Sciences',
+    'legal': 'Legal Studies',
+    'english': 'English',
+    'humanities': 'Liberal Arts & Humanities',
+    'library': 'Library Science',
+    'biological': 'Biological Sciences',
+    'mathematics': 'Mathematics',
+    'military': 'Military Science',
+    'multidiscipline': 'Multidisciplinary Studies',
+    'parks_recreation_fitness': 'Parks, Recreation & Fitness',
+    'philosophy_religious': 'Philosophy & Religious Studies',
+    'theology_religious_vocation': 'Theology & Religious Vocations',
+    'physical_science': 'Physical Sciences',
+    'science_technology': 'Science Technology',
+    'psychology': 'Psychology',
+    'security_law_enforcement': 'Security & Law Enforcement',
+    'public_administration_social_service': 'Public Administration',
+    'social_science': 'Social Sciences',
+    'construction': 'Construction Trades',
+    'mechanic_repair_technology': 'Mechanic & Repair Technology',
+    'precision_production': 'Precision Production',
+    'transportation': 'Transportation',
+    'visual_performing': 'Visual & Performing Arts',
+    'health': 'Health Professions',
+    'business_marketing': 'Business & Marketing',
+    'history': 'History'
+}
+# Per-major field paths, built once so request values never become query paths
+MAJOR_PERCENTAGE_PATHS = {major: f'academics.program_percentage.{major}' for major in MAJOR_NAMES}
+
+# completion-rates group_by -> denormalized school field to group on
+COMPLETION_GROUP_FIELDS = {
+    'state': 'school_state',
+    'ownership': 'school_ownership',
+    'degree_level': 'school_degree_level'
+}
+
+# Low-churn school fields jobs.sync_school_fields copies onto costs_aid_completion
+# rows (local name -> path in schools), so aggregations can skip the schools $lookup
+DENORMALIZED_SCHOOL_FIELDS = {
+    'school_state': 'school.state',
+    'school_ownership': 'school.ownership',
+    'school_name': 'school.name',
+    'school_city': 'school.city',
+    'school_size': 'school.student.size',
+    'school_degree_level': 'school.degrees_awarded.predominant',
+}
+
+# Accumulators shared by the live and pre-computed program trend pipelines
+PROGRAM_TRENDS_ACCUMULATORS = {
+    'avg_1yr_earnings': {'$avg': '$programs.earnings.1_yr_after.median'},
+    'avg_3yr_earnings': {'$avg': '$programs.earnings.3_yrs_after.median'},
+    'avg_5yr_earnings': {'$avg': '$programs.earnings.5_yrs_after.median'},
+    'avg_debt': {'$avg': '$programs.debt.median'},
+    'school_count': {'$sum': 1}
+}
+
+
+def chunked(items, size=IN_QUERY_CHUNK_SIZE):
+    """Split a list into consecutive chunks of at most `size` items"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def map_chunks(fetch, items, size=IN_QUERY_CHUNK_SIZE):
+    """
+    Call fetch(chunk) for each chunk of items and concatenate the returned lists.
+    Chunks are fetched in parallel when there is more than one.
+    """
+    chunks = list(chunked(items, size))
+    if len(chunks) <= 1:
+        return fetch(chunks[0]) if chunks else []
+
+    with ThreadPoolExecutor(max_workers=min(len(chunks), IN_QUERY_MAX_WORKERS)) as executor:
+        return [doc for docs in executor.map(fetch, chunks) for doc in docs]
+
+
+def dig(doc, keys):
+    """Follow a sequence of keys into a nested document (None when any part is missing)"""
+    for key in keys:
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+def get_path(doc, path):
+    """Read a dotted path from a nested document (None when any part is missing)"""
+    return dig(doc, path.split('.'))
+
+
+def keyset_match(sort_field, sort_order, after_value, after_id):
+    """
+    Match documents that sort after (after_value, after_id) for keyset pagination
+    Null/missing sort values sort first ascending and last descending
+    """
+    op = '$gt' if sort_order == 1 else '$lt'
+    if after_value is None:
+        past = [{sort_field: {'$ne': None}}] if sort_order == 1 else []
+    else:
+        past = [{sort_field: {op: after_value}}]
+        if sort_order == -1:
+            past.append({sort_field: None})
+    return {'$or': past + [{sort_field: after_value, 'school_id': {op: after_id}}]}
+
+
+def list_view_hint(query, sort_field):
+    """Pick the sort-supporting index for a filter_schools query shape (None to let the planner choose)"""
+    if not query:
+        return SORT_INDEXES.get(sort_field)
+    if len(query) == 1 and sort_field == 'latest.student.size':
+        return FILTERED_SIZE_INDEXES.get(next(iter(query)))
+    return None
+
+
+def run_aggregation(collection, pipeline, comment, **kwargs):
+    """
+    Run a request-path aggregation capped at AGGREGATION_MAX_TIME_MS and kept in memory
+    (no disk spill); `comment` names the caller in the profiler and slow-query log
+    """
+    if has_request_context() and 'explains' in g:
+        g.explains.append(explain_aggregation(collection, pipeline, comment, kwargs.get('hint')))
+
+    try:
+        return collection.aggregate(
+            pipeline,
+            allowDiskUse=False,
+            maxTimeMS=AGGREGATION_MAX_TIME_MS,
+            comment=comment,
+            **kwargs
+        )
+    except OperationFailure as e:
+        # Time-outs and "exceeded memory limit" errors flag pipelines to triage
+        logger.warning("Aggregation %s on %s failed: %s", comment, collection.name, e)
+        raise
+
+
+def explain_aggregation(collection, pipeline, comment, hint=None):
+    """
+    executionStats explain of an aggregation, with the headline counters pulled out
+    (from the top level when the whole pipeline ran as a find, else its $cursor stage)
+    """
+    command = SON([('aggregate', collection.name), ('pipeline', pipeline), ('cursor', {})])
+    if hint:
+        command['hint'] = SON(hint) if isinstance(hint, list) else hint
+    try:
+        explain = collection.database.command('explain', command, verbosity='executionStats')
+    except OperationFailure as e:
+        return {'comment': comment, 'collection': collection.name, 'error': str(e)}
+
+    stats = explain.get('executionStats')
+    if stats is None:
+        stats = explain.get('stages', [{}])[0].get('$cursor', {}).get('executionStats', {})
+    return {
+        'comment': comment,
+        'collection': collection.name,
+        **{field: stats.get(field) for field in EXPLAIN_STAT_FIELDS},
+        'explain': {k: v for k, v in explain.items() if k not in EXPLAIN_NOISE_FIELDS}
+    }
+
+
+def is_bad_hint(error):
+    """Whether an OperationFailure means the hinted index does not exist"""
+    return error.code == 2 or 'hint provided does not correspond to an existing index' in str(error)
+
+
+def aggregate_with_hint(collection, pipeline, comment, hint=None):
+    """
+    Run an aggregation with an index hint, retrying unhinted if the index is missing
+    Other failures (maxTimeMS, memory limit) are re-raised rather than run a second time
+    """
+    if hint:
+        try:
+            return list(run_aggregation(collection, pipeline, comment, hint=hint))
+        except OperationFailure as e:
+            if not is_bad_hint(e):
+                raise
+    return list(run_aggregation(collection, pipeline, comment))
+
+
+def index_by_school(collection, projection, school_ids, year):
+    """Fetch one year's docs for several schools in one query, keyed by school_id"""
+    cursor = collection.find(
+        {'school_id': {'$in': school_ids}, 'year': year},
+        projection
+    ).batch_size(len(school_ids))
+    return {doc['school_id']: doc for doc in cursor}
+
+
+def normalize_school_doc(doc):
+    """
+    Normalizes the school document for consistent frontend access
+    Module-level (not a SchoolModel attribute) since it runs once per returned school
+    """
+    if not doc:
+        return doc
+
+    latest = doc.get('latest', {}) or {}
+
+    for dest, paths in NORMALIZE_PATHS:
+        for path in paths:
+            value = dig(latest, path)
+            # Flattened keys are scalars; a dict means the path stopped short
+            if value is not None and not isinstance(value, dict):
+                latest[dest] = value
+                break
+
+    doc['latest'] = latest
+    return doc
+
+
+def summary_projection():
+    """
+    Build a $project that flattens `latest` on the server the way normalize_school_doc does
+    List views get the school fields plus only the flattened latest.* keys
+    """
+    projection = {
+        path: value for path, value in SCHOOL_LIST_PROJECTION.items()
+        if not path.startswith('latest.')
+    }
+    for dest, paths in NORMALIZE_PATHS:
+        refs = ['$latest.' + '.'.join(path) for path in paths]
+        expr = refs[-1]
+        for ref in reversed(refs[:-1]):
+            expr = {'$ifNull': [ref, expr]}
+        # Never flatten a sub-document (a path that stopped short)
+        projection[f'latest.{dest}'] = {
+            '$cond': [{'$eq': [{'$type': expr}, 'object']}, '$$REMOVE', expr]
+        }
+    return projection
+
+
+SCHOOL_SUMMARY_PROJECTION = summary_projection()
+
+# Raw sort path -> its flattened key in SCHOOL_SUMMARY_PROJECTION output
+SUMMARY_SORT_KEYS = {
+    'latest.' + '.'.join(paths[0]): f'latest.{dest}'
+    for dest, paths in NORMALIZE_PATHS if len(paths) == 1
+}
+
+
+@cache.memoize(300)
+def program_shares_ready():
+    """Whether jobs.py has written the tall program_shares array (re-checked every few minutes)"""
+    return get_collection('academics_programs').find_one(
+        {'program_shares': {'$exists': True}}, {'_id': 1}
+    ) is not None
+
+
+@cache.memoize(300)
+def school_fields_ready():
+    """Whether jobs.py has copied DENORMALIZED_SCHOOL_FIELDS onto costs_aid_completion (re-checked every few minutes)"""
+    return get_collection('costs_aid_completion').find_one(
+        {'school_name': {'$exists': True}}, {'_id': 1}
+    ) is not None
+
+
+@cache.memoize(300)
+def roi_cache_ready():
+    """Whether jobs.py has populated the ROI collection (re-checked every few minutes)"""
+    return get_collection(ROI_CACHE).estimated_document_count() > 0
+
+
+@cache.memoize(300)
+def school_summary_ready():
+    """Whether jobs.py has populated school_summary (re-checked every few minutes)"""
+    return get_collection(SCHOOL_SUMMARY).estimated_document_count() > 0
+
+
 class SchoolModel:
     """Model for schools collection"""
+
+    _collection = None
     
+    @classmethod
+    def get_collection(cls):
+        # Resolve the collection handle once and reuse it
+        if cls._collection is None:
+            cls._collection = get_collection('schools')
+        return cls._collection
+
     @staticmethod
-    def get_collection():
-        return get_collection('schools')
-
-    @staticmethod
-    def _normalize_school_doc(doc):
-        """Normalizes the school document for consistent frontend access"""
-        if not doc:
-            return doc
-
-        latest = doc.get('latest', {}) or {}
-
-        # Handle avg_net_price - check for private, public, or overall
-        avg_net_price = None
-        if 'cost' in latest:
-            cost_data = latest.get('cost', {})
-            avg_net_price_data = cost_data.get('avg_net_price', {})
-            
-            # Try different field names
-            avg_net_price = (
-                avg_net_price_data.get('overall') or
-                avg_net_price_data.get('public') or
-                avg_net_price_data.get('private') or
-                cost_data.get('tuition', {}).get('in_state')
-            )
+    def get_list_collection():
+        """
+        Collection backing list views: the slim school_summary copy once jobs.py
+        has filled it, the full schools collection until then
+        """
+        if school_summary_ready():
+            return get_collection(SCHOOL_SUMMARY)
+        return SchoolModel.get_collection()
 
-        if avg_net_price is not None:
-            latest['avg_net_price'] = avg_net_price
-
-        # Admission rate
-        if latest.get('admissions') and latest['admissions'].get('admission_rate'):
-            latest['admission_rate'] = latest['admissions']['admission_rate'].get('overall')
-
-        # SAT/ACT scores
-        if latest.get('admissions') and latest['admissions'].get('sat_scores'):
-            latest['sat_avg'] = latest['admissions']['sat_scores'].get('average', {}).get('overall')
-        if latest.get('admissions') and latest['admissions'].get('act_scores'):
-            latest['act_avg'] = latest['admissions']['act_scores'].get('midpoint', {}).get('cumulative')
-
-        # Student size
-        if latest.get('student') and 'size' in latest['student']:
-            latest['size'] = latest['student'].get('size')
-
-        # Tuition
-        if latest.get('cost') and latest['cost'].get('tuition'):
-            latest['tuition_in_state'] = latest['cost']['tuition'].get('in_state')
-            latest['tuition_out_of_state'] = latest['cost']['tuition'].get('out_of_state')
-
-        # Completion rates
-        if latest.get('completion'):
-            if 'completion_rate_4yr_150nt' in latest['completion']:
-                latest['completion_rate_4yr'] = latest['completion'].get('completion_rate_4yr_150nt')
-            if 'rate_suppressed' in latest['completion']:
-                latest['completion_rate_overall'] = latest['completion']['rate_suppressed'].get('four_year')
-
-        # Earnings
-        if latest.get('earnings'):
-            if '10_yrs_after_entry' in latest['earnings']:
-                latest['median_earnings_10yr'] = latest['earnings']['10_yrs_after_entry'].get('median')
-            if '6_yrs_after_entry' in latest['earnings']:
-                latest['median_earnings_6yr'] = latest['earnings']['6_yrs_after_entry'].get('median')
-
-        # Aid and debt
-        if latest.get('aid'):
-            latest['pell_grant_rate'] = latest['aid'].get('pell_grant_rate')
-            if 'median_debt' in latest['aid']:
-                debt_data = latest['aid']['median_debt']
-                if isinstance(debt_data, dict) and 'completers' in debt_data:
-                    latest['median_debt'] = debt_data.get('completers', {}).get('overall')
-                else:
-                    latest['median_debt'] = debt_data
-
-        # Repayment
-        if latest.get('repayment'):
-            latest['default_rate_3yr'] = latest['repayment'].get('3_yr_default_rate')
-
-        doc['latest'] = latest
-        return doc
     
     @staticmethod
+    @cache.memoize(SCHOOL_CACHE_TIMEOUT)
     def find_by_id(school_id):
         """Find school by school_id"""
         doc = SchoolModel.get_collection().find_one(
             {'school_id': school_id},
             SCHOOL_DETAIL_PROJECTION
         )
-        return SchoolModel._normalize_school_doc(doc)
+        return normalize_school_doc(doc)
     
+    @staticmethod
+    def count_by_state():
+        """
+        Count schools per state
+        Only school.state is read, so the hinted index covers the scan without fetching documents
+        """
+        pipeline = [
+            {'$sort': {'school.state': 1}},
+            {'$project': {'_id': 0, 'school.state': 1}},
+            {'$group': {
+                '_id': '$school.state',
+                'count': {'$sum': 1}
+            }},
+            {'$sort': {'_id': 1}}
+        ]
+        return aggregate_with_hint(
+            SchoolModel.get_collection(), pipeline, 'count_by_state', hint=SCHOOL_STATE_INDEX
+        )
+
+    @staticmethod
+    def find_ids(state=None, ownership=None):
+        """
+        school_ids matching a state/ownership filter
+        Lets aggregations narrow their input before joining schools (served by the state index)
+        """
+        query = {}
+        if state:
+            query['school.state'] = state
+        if ownership is not None:
+            query['school.ownership'] = ownership
+        return SchoolModel.get_list_collection().distinct('school_id', query)
+
+    @staticmethod
+    def lookup_stage(fields, as_field='school_info'):
+        """
+        $lookup joining schools on school_id that returns only `fields`
+        Keeps each joined document to a few fields instead of the whole school record
+        """
+        return {
+            '$lookup': {
+                'from': 'schools',
+                'localField': 'school_id',
+                'foreignField': 'school_id',
+                'pipeline': [{'$project': {'_id': 0, **{field: 1 for field in fields}}}],
+                'as': as_field
+            }
+        }
+
     @staticmethod
     def search_by_name(query, limit=20):
-        """Search schools by name using text search"""
+        """
+        Search schools by name
+        Short plain queries try a name prefix match first; text search is the fallback
+        """
+        query = query.strip()
+        if len(query.split()) <= PREFIX_SEARCH_MAX_TOKENS and PREFIX_SEARCH_PATTERN.match(query):
+            cursor = SchoolModel.get_collection().find(
+                {'school.name_lower': {'$regex': '^' + re.escape(query.lower())}},
+                SCHOOL_LIST_PROJECTION
+            ).sort('school.name_lower', 1).limit(limit).batch_size(limit)
+            results = [normalize_school_doc(d) for d in cursor]
+            if results:
+                return results
+
         projection = {**SCHOOL_LIST_PROJECTION, 'score': {'$meta': 'textScore'}}
-        docs = list(SchoolModel.get_collection().find(
+        cursor = SchoolModel.get_collection().find(
             {'$text': {'$search': query}},
             projection
-        ).sort([('score', {'$meta': 'textScore'})]).limit(limit))
-        return [SchoolModel._normalize_school_doc(d) for d in docs]
+        ).sort([('score', {'$meta': 'textScore'})]).limit(limit).batch_size(limit)
+        return [normalize_school_doc(d) for d in cursor]
 
     @staticmethod
-    def filter_schools(filters, skip=0, limit=20):
-        """Filter schools based on various criteria"""
+    @cache.memoize(300)
+    def filter_schools(filters, skip=0, limit=20, after=None):
+        """
+        Filter schools based on various criteria
+        Only list-view fields are returned, with `latest` flattened server-side
+        Pass `after` (the previous page's next_cursor) to seek instead of skipping;
+        cursor pages skip counting and return total None (the first page has it)
+        """
         query = {}
+        for name, value in filters.items():
+            if value is None or value == '' or name not in FILTER_FIELD_MAP:
+                continue
+            path, op = FILTER_FIELD_MAP[name]
+            if op == '$eq':
+                query[path] = value
+            else:
+                # Range bounds on the same path share one operator document
+                query.setdefault(path, {})[op] = value
         
-        # State filter
-        if filters.get('state'):
-            query['school.state'] = filters['state']
-        
-        # Ownership filter
-        if filters.get('ownership'):
-            query['school.ownership'] = filters['ownership']
-        
-        # Degree level filter
-        if filters.get('degree_level'):
-            query['school.degrees_awarded.predominant'] = filters['degree_level']
-        
-        # School IDs filter (for major filtering)
-        if filters.get('school_ids'):
-            query['school_id'] = {'$in': filters['school_ids']}
-        
-        sort_key = filters.get('sort_by', 'size')
-        sort_field = SORT_FIELD_MAP.get(sort_key, "latest.student.size")
-        sort_order = 1 if filters.get('sort_order') == 'asc' else -1
-
-        total_count = SchoolModel.get_collection().count_documents(query)
-
-        results = list(
-            SchoolModel.get_collection()
-                .find(query, SCHOOL_LIST_PROJECTION)
-                .sort(sort_field, sort_order)
-                .skip(skip)
-                .limit(limit)
+        sort_field, sort_order = SORT_SPEC.get(
+            (filters.get('sort_by', 'size'), filters.get('sort_order', 'desc')),
+            DEFAULT_SORT
         )
 
-        results = [SchoolModel._normalize_school_doc(r) for r in results]
+        # school_id breaks ties so keyset pages neither repeat nor drop schools
+        page_stages = [{'$sort': {sort_field: sort_order, 'school_id': sort_order}}]
+        if after is not None:
+            after_value, after_id = after
+            page_stages.insert(0, {'$match': keyset_match(sort_field, sort_order, after_value, after_id)})
+        else:
+            page_stages.append({'$skip': skip})
+
+        page_stages += [{'$limit': limit}, {'$project': SCHOOL_SUMMARY_PROJECTION}]
+        collection = SchoolModel.get_list_collection()
+
+        if after is not None:
+            # Clients walking a cursor already have the total from the first page
+            results = aggregate_with_hint(
+                collection, [{'$match': query}] + page_stages, 'filter_schools',
+                hint=list_view_hint(query, sort_field)
+            )
+            total_count = None
+        elif query:
+            # Fetch the page and the total count in one round-trip
+            pipeline = [
+                {'$match': query},
+                {'$facet': {
+                    'results': page_stages,
+                    'total': [{'$count': 'n'}]
+                }}
+            ]
+
+            faceted = next(run_aggregation(collection, pipeline, 'filter_schools'), {})
+            total = faceted.get('total') or [{}]
+            total_count = total[0].get('n', 0)
+            results = faceted.get('results', [])
+        else:
+            # Unfiltered listing: count from collection metadata, and run the page
+            # outside $facet so its sort can walk an index
+            results = aggregate_with_hint(
+                collection, page_stages, 'filter_schools', hint=list_view_hint(query, sort_field)
+            )
+            total_count = collection.estimated_document_count()
+
+        next_cursor = None
+        if len(results) == limit:
+            last = results[-1]
+            cursor_path = SUMMARY_SORT_KEYS.get(sort_field, sort_field)
+            next_cursor = [get_path(last, cursor_path), last.get('school_id')]
 
         return {
             'results': results,
             'total': total_count,
             'page': (skip // limit) + 1,
-            'limit': limit
+            'limit': limit,
+            'next_cursor': next_cursor
         }
     
     @staticmethod
     def get_multiple_by_ids(school_ids):
-        """Get multiple schools by their IDs"""
-        docs = list(SchoolModel.get_collection().find(
-            {'school_id': {'$in': school_ids}},
-            SCHOOL_LIST_PROJECTION
-        ))
-        return [SchoolModel._normalize_school_doc(d) for d in docs]
+        """
+        Get multiple schools by their IDs (list-view fields only)
+        Docs are cached per school_id, so only unseen schools are fetched
+        """
+        collection = SchoolModel.get_list_collection()
+
+        def fetch(ids):
+            cursor = collection.find(
+                {'school_id': {'$in': ids}},
+                SCHOOL_LIST_PROJECTION
+            ).batch_size(len(ids))
+            return [normalize_school_doc(d) for d in cursor]
+
+        keys = [f'school_list:{school_id}' for school_id in school_ids]
+        cached = [doc for doc in cache.get_many(*keys) if doc is not None]
+        seen = {doc['school_id'] for doc in cached}
+        missing = [school_id for school_id in school_ids if school_id not in seen]
+
+        fetched = map_chunks(fetch, missing)
+        if fetched:
+            cache.set_many(
+                {f'school_list:{doc["school_id"]}': doc for doc in fetched},
+                timeout=SCHOOL_CACHE_TIMEOUT
+            )
+        return cached + fetched
 
 
 class CostsAidCompletionModel:
     """Model for costs_aid_completion collection"""
+
+    _collection = None
     
-    @staticmethod
-    def get_collection():
-        return get_collection('costs_aid_completion')
+    @classmethod
+    def get_collection(cls):
+        if cls._collection is None:
+            cls._collection = get_collection('costs_aid_completion')
+        return cls._collection
     
     @staticmethod
     def find_by_school_and_year(school_id, year=2023):
@@ -237,6 +703,13 @@ class CostsAidCompletionModel:
             {'school_id': school_id, 'year': year},
             COSTS_AID_PROJECTION
         )
+
+    @staticmethod
+    def find_by_schools_and_year(school_ids, year=2023):
+        """Get cost, aid, and completion data for several schools, keyed by school_id"""
+        return index_by_school(
+            CostsAidCompletionModel.get_collection(), COSTS_AID_PROJECTION, school_ids, year
+        )
     
     @staticmethod
     def get_historical_data(school_id, years=5):
@@ -247,10 +720,62 @@ class CostsAidCompletionModel:
         ).sort('year', -1).limit(years))
     
     @staticmethod
+    def match_hint(match):
+        """Index for a pipeline's leading year $match, so the planner doesn't re-race candidates"""
+        if 'school_state' in match:
+            return COSTS_YEAR_STATE_INDEX
+        if 'school_id' in match:
+            return COSTS_YEAR_SCHOOL_INDEX
+        if 'earnings.10_yrs_after_entry.median' in match:
+            return COSTS_YEAR_EARNINGS_INDEX
+        return COSTS_YEAR_SCHOOL_INDEX
+
+    @staticmethod
+    def aggregate(pipeline, comment):
+        """Run a request-path pipeline on this collection, hinted by its leading $match"""
+        return aggregate_with_hint(
+            CostsAidCompletionModel.get_collection(), pipeline, comment,
+            hint=CostsAidCompletionModel.match_hint(pipeline[0]['$match'])
+        )
+
+    @staticmethod
+    def school_conditions(state=None, ownership=None):
+        """
+        $match conditions selecting the rows of schools in `state`/`ownership`
+        Uses the denormalized fields once synced; until then the school_ids are
+        resolved up front, so a later schools $lookup only sees matching rows
+        """
+        conditions = {}
+        if school_fields_ready():
+            if state:
+                conditions['school_state'] = state
+            if ownership is not None:
+                conditions['school_ownership'] = ownership
+        elif state or ownership is not None:
+            conditions['school_id'] = {'$in': SchoolModel.find_ids(state=state, ownership=ownership)}
+        return conditions
+
+    @staticmethod
+    def school_field_stages(fields):
+        """
+        Stages giving each row the denormalized school `fields` (DENORMALIZED_SCHOOL_FIELDS keys)
+        Nothing to do once jobs.py has synced them; a slim schools $lookup until then
+        """
+        if school_fields_ready():
+            return []
+        return [
+            SchoolModel.lookup_stage([DENORMALIZED_SCHOOL_FIELDS[field] for field in fields]),
+            {'$unwind': '$school_info'},
+            {'$set': {field: '$school_info.' + DENORMALIZED_SCHOOL_FIELDS[field] for field in fields}},
+            {'$unset': 'school_info'}
+        ]
+    
+    @staticmethod
+    @lru_cache(maxsize=None)
     def get_cost_field_expr():
         """
         Returns a MongoDB expression to extract cost, trying multiple field paths.
-        Use this in aggregation pipelines.
+        Use this in aggregation pipelines. Built once and shared: embed it, don't mutate it.
         """
         return {
             '$ifNull': [
@@ -270,55 +795,318 @@ class CostsAidCompletionModel:
         }
     
     @staticmethod
+    # Empty results are not cached, so rows written by jobs.py are picked up on the next call
+    @cache.memoize(3600, response_filter=bool)
     def get_state_aggregations(state=None):
-        """Get aggregated statistics by state"""
+        """
+        Get aggregated statistics by state
+        Served from the pre-computed cache collection; computed online until jobs.py has run
+        """
+        cache_collection = get_collection(STATE_AGGREGATIONS_CACHE)
+        results = list(cache_collection.find({'_id': state} if state else {}).sort('_id', 1))
+        if results or cache_collection.estimated_document_count():
+            return results
+
+        pipeline = CostsAidCompletionModel.state_aggregations_pipeline(
+            state,
+            CostsAidCompletionModel.school_field_stages(['school_state'])
+        )
+        return list(run_aggregation(get_analytics_collection('costs_aid_completion'), pipeline, 'get_state_aggregations'))
+
+    @staticmethod
+    def state_aggregations_pipeline(state=None, school_stages=()):
+        """
+        Pipeline grouping cost/earnings/completion by state
+        `school_stages` supplies school_state when it is not denormalized yet
+        Schools without a state form a null group, as rows joined to schools always did
+        """
         if state:
-            pipeline = [
-                {'$lookup': {
-                    'from': 'schools',
-                    'localField': 'school_id',
-                    'foreignField': 'school_id',
-                    'as': 'school_info'
-                }},
-                {'$unwind': '$school_info'},
-                {'$match': {'school_info.school.state': state, 'year': 2023}},
-                {'$group': {
-                    '_id': '$school_info.school.state',
-                    'avg_cost': {'$avg': CostsAidCompletionModel.get_cost_field_expr()},
-                    'avg_earnings_10yr': {'$avg': '$earnings.10_yrs_after_entry.median'},
-                    'avg_completion_rate': {'$avg': '$completion.completion_rate_4yr_150nt'},
-                    'school_count': {'$sum': 1}
-                }}
-            ]
+            school_match = {'school_state': state}
+        elif school_stages:
+            # The $unwind in school_stages already drops rows without a school
+            school_match = {}
         else:
-            pipeline = [
-                {'$match': {'year': 2023}},
-                {'$lookup': {
-                    'from': 'schools',
-                    'localField': 'school_id',
-                    'foreignField': 'school_id',
-                    'as': 'school_info'
-                }},
-                {'$unwind': '$school_info'},
-                {'$group': {
-                    '_id': '$school_info.school.state',
-                    'avg_cost': {'$avg': CostsAidCompletionModel.get_cost_field_expr()},
-                    'avg_earnings_10yr': {'$avg': '$earnings.10_yrs_after_entry.median'},
-                    'avg_completion_rate': {'$avg': '$completion.completion_rate_4yr_150nt'},
-                    'school_count': {'$sum': 1}
+            # Synced rows with a school carry school_state, null included; the rest lack it
+            school_match = {'school_state': {'$exists': True}}
+        return [
+            {'$match': {'year': 2023}},
+            *school_stages,
+            {'$match': school_match},
+            {'$group': {
+                '_id': '$school_state',
+                'avg_cost': {'$avg': CostsAidCompletionModel.get_cost_field_expr()},
+                'avg_earnings_10yr': {'$avg': '$earnings.10_yrs_after_entry.median'},
+                'avg_completion_rate': {'$avg': '$completion.completion_rate_4yr_150nt'},
+                'school_count': {'$sum': 1}
+            }},
+            {'$sort': {'_id': 1}}
+        ]
+
+    @staticmethod
+    @cache.memoize(3600)
+    def get_state_comparison(year):
+        """
+        Per-state cost/earnings/completion/aid averages, medians and ownership counts for a year
+        Served from the pre-computed cache collection; computed online until jobs.py has run
+        """
+        cached = get_collection(STATE_COMPARISON_CACHE).find_one({'_id': year})
+        if cached:
+            return cached['states']
+
+        pipeline = CostsAidCompletionModel.state_comparison_pipeline(
+            year,
+            CostsAidCompletionModel.school_field_stages(['school_state', 'school_ownership'])
+        )
+        return list(run_aggregation(get_analytics_collection('costs_aid_completion'), pipeline, 'get_state_comparison'))
+
+    @staticmethod
+    def state_comparison_pipeline(year, school_stages=()):
+        """
+        Pipeline behind get_state_comparison
+        `school_stages` supplies school_state/school_ownership when they are not denormalized yet
+        """
+        return [
+            {'$match': {'year': year}},
+            *school_stages,
+            {'$group': {
+                '_id': '$school_state',
+                'total_schools': {'$sum': 1},
+                'avg_cost': {'$avg': CostsAidCompletionModel.get_cost_field_expr()},
+                'avg_earnings_6yr': {'$avg': '$earnings.6_yrs_after_entry.median'},
+                'avg_earnings_10yr': {'$avg': '$earnings.10_yrs_after_entry.median'},
+                'avg_completion_rate': {'$avg': '$completion.completion_rate_4yr_150nt'},
+                'avg_pell_grant_rate': {'$avg': '$aid.pell_grant_rate'},
+                'avg_default_rate': {'$avg': '$repayment.3_yr_default_rate'},
+                'public_schools': {'$sum': {'$cond': [{'$eq': ['$school_ownership', 1]}, 1, 0]}},
+                'private_nonprofit_schools': {'$sum': {'$cond': [{'$eq': ['$school_ownership', 2]}, 1, 0]}},
+                'private_forprofit_schools': {'$sum': {'$cond': [{'$eq': ['$school_ownership', 3]}, 1, 0]}},
+                # Also read by the state analytics summary, so it needs no percentile of its own
+                'median_cost': {'$percentile': {
+                    'input': CostsAidCompletionModel.get_cost_field_expr(),
+                    'p': [0.5],
+                    'method': 'approximate'
                 }},
-                {'$sort': {'_id': 1}}
-            ]
-        
-        return list(CostsAidCompletionModel.get_collection().aggregate(pipeline))
+                'median_earnings_10yr': {'$percentile': {
+                    'input': '$earnings.10_yrs_after_entry.median',
+                    'p': [0.5],
+                    'method': 'approximate'
+                }}
+            }},
+            {'$set': {
+                'median_cost': {'$first': '$median_cost'},
+                'median_earnings_10yr': {'$first': '$median_earnings_10yr'}
+            }},
+            {'$sort': {'_id': 1}}
+        ]
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def usable_cost_and_earnings():
+        """Conditions keeping rows with a positive cost and 10-year earnings (both local fields)"""
+        return {
+            'earnings.10_yrs_after_entry.median': {'$gt': 0},
+            '$expr': {'$gt': [CostsAidCompletionModel.get_cost_field_expr(), 0]}
+        }
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def roi_metric_stages():
+        """
+        Stages adding roi_cost and roi_10yr to rows kept by usable_cost_and_earnings
+        Those rows have a positive cost and earnings, so the ratio needs no zero guards
+        """
+        return [
+            {'$set': {'roi_cost': CostsAidCompletionModel.get_cost_field_expr()}},
+            # ROI = (10yr earnings * 10 - 4 * cost) / (4 * cost)
+            {'$set': {
+                'roi_10yr': {
+                    '$let': {
+                        'vars': {'total_cost': {'$multiply': ['$roi_cost', 4]}},
+                        'in': {
+                            '$divide': [
+                                {'$subtract': [
+                                    {'$multiply': ['$earnings.10_yrs_after_entry.median', 10]},
+                                    '$$total_cost'
+                                ]},
+                                '$$total_cost'
+                            ]
+                        }
+                    }
+                }
+            }}
+        ]
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def roi_output_projection():
+        """$project shaping rows from roi_metric_stages (with school fields) into ROI results"""
+        return {
+            'school_id': 1,
+            'school_name': '$school_name',
+            'state': '$school_state',
+            'ownership': '$school_ownership',
+            'cost': {'$round': ['$roi_cost', 0]},
+            'earnings_10yr': {'$round': ['$earnings.10_yrs_after_entry.median', 0]},
+            'completion_rate': {'$round': ['$completion.completion_rate_4yr_150nt', 4]},
+            'median_debt': {'$round': [{
+                '$ifNull': [
+                    '$aid.median_debt.completers.overall',
+                    '$aid.median_debt'
+                ]
+            }, 0]},
+            'roi_10yr': {'$round': ['$roi_10yr', 2]},
+            # Simple payback period: (4 * cost) / annual_earnings
+            'payback_years': {'$round': [{
+                '$divide': [
+                    {'$multiply': ['$roi_cost', 4]},
+                    '$earnings.10_yrs_after_entry.median'
+                ]
+            }, 1]}
+        }
+
+    @staticmethod
+    def find_roi_rows(year, state=None, ownership=None, major=None, limit=100,
+                      projection=None, by_roi=True):
+        """
+        Rows of the pre-computed ROI collection for a year, filtered like the live pipelines
+        Best ROI first unless `by_roi` is False
+        """
+        query = {'year': year}
+        if state:
+            query['state'] = state
+        if ownership is not None:
+            query['ownership'] = ownership
+        if major:
+            query['school_id'] = {'$in': AcademicsProgramsModel.find_schools_with_major(major, 0.05, year)}
+
+        cursor = get_collection(ROI_CACHE).find(query, projection or ROI_RESULT_PROJECTION)
+        if by_roi:
+            cursor = cursor.sort('roi_10yr', -1)
+        return list(cursor.limit(limit))
+
+    @staticmethod
+    @cache.memoize(3600)
+    def get_earnings_distribution(year):
+        """
+        Unfiltered earnings distribution for a year
+        Served from the pre-computed cache collection; computed online until jobs.py has run
+        """
+        cached = get_collection(EARNINGS_DISTRIBUTION_CACHE).find_one({'_id': year})
+        if cached:
+            return cached['distribution']
+
+        pipeline = CostsAidCompletionModel.earnings_distribution_pipeline(
+            {'$match': {'year': year}},
+            CostsAidCompletionModel.school_field_stages(['school_name'])
+        )
+        return list(run_aggregation(get_analytics_collection('costs_aid_completion'), pipeline, 'get_earnings_distribution'))
+
+    @staticmethod
+    def earnings_distribution_pipeline(match_stage, school_stages=()):
+        """
+        Pipeline bucketing 10-year earnings for the rows selected by `match_stage`
+        `school_stages` supplies school_name when it is not denormalized yet
+        """
+        return [match_stage, *school_stages, *CostsAidCompletionModel.earnings_bucket_stages()]
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def earnings_bucket_stages():
+        """Stages bucketing rows (with school_name) by 10-year earnings (built once, shared)"""
+        return [
+            {'$match': {'earnings.10_yrs_after_entry.median': {'$ne': None, '$gt': 0}}},
+            {'$bucket': {
+                'groupBy': '$earnings.10_yrs_after_entry.median',
+                'boundaries': EARNINGS_BUCKETS,
+                'default': 'other',
+                'output': {
+                    'count': {'$sum': 1},
+                    'avg_earnings': {'$avg': '$earnings.10_yrs_after_entry.median'},
+                    'schools': {
+                        '$topN': {
+                            'n': EARNINGS_BUCKET_SCHOOLS,
+                            'sortBy': {'earnings.10_yrs_after_entry.median': -1},
+                            'output': {
+                                'school_id': '$school_id',
+                                'name': '$school_name',
+                                'earnings': '$earnings.10_yrs_after_entry.median'
+                            }
+                        }
+                    }
+                }
+            }}
+        ]
+
+    @staticmethod
+    def completion_rates_cache_id(year, group_by):
+        """_id of a year/group_by document in the completion rates cache collection"""
+        return {'year': year, 'group_by': group_by}
+
+    @staticmethod
+    @cache.memoize(3600)
+    def get_completion_rates(year, group_by):
+        """
+        Completion rate statistics for a year grouped by a COMPLETION_GROUP_FIELDS key
+        Served from the pre-computed cache collection; computed online until jobs.py has run
+        """
+        cached = get_collection(COMPLETION_RATES_CACHE).find_one(
+            {'_id': CostsAidCompletionModel.completion_rates_cache_id(year, group_by)}
+        )
+        if cached:
+            return cached['data']
+
+        pipeline = CostsAidCompletionModel.completion_rates_pipeline(
+            year, group_by,
+            CostsAidCompletionModel.school_field_stages([COMPLETION_GROUP_FIELDS[group_by]])
+        )
+        return list(run_aggregation(get_analytics_collection('costs_aid_completion'), pipeline, 'get_completion_rates'))
+
+    @staticmethod
+    def completion_rates_pipeline(year, group_by, school_stages=()):
+        """
+        Pipeline summarizing 4-year completion rates per COMPLETION_GROUP_FIELDS group
+        `school_stages` supplies the group field when it is not denormalized yet
+        """
+        return [
+            {'$match': {'year': year}},
+            *school_stages,
+            *CostsAidCompletionModel.completion_group_stages(group_by)
+        ]
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def completion_group_stages(group_by):
+        """Stages summarizing 4-year completion rates per COMPLETION_GROUP_FIELDS group (built once per group, shared)"""
+        return [
+            {'$match': {'completion.completion_rate_4yr_150nt': {'$ne': None}}},
+            {'$group': {
+                '_id': '$' + COMPLETION_GROUP_FIELDS[group_by],
+                'avg_completion_4yr': {'$avg': '$completion.completion_rate_4yr_150nt'},
+                'median_completion_4yr': {
+                    '$percentile': {
+                        'input': '$completion.completion_rate_4yr_150nt',
+                        'p': [0.5],
+                        'method': 'approximate'
+                    }
+                },
+                'min_completion': {'$min': '$completion.completion_rate_4yr_150nt'},
+                'max_completion': {'$max': '$completion.completion_rate_4yr_150nt'},
+                'school_count': {'$sum': 1}
+            }},
+            {'$sort': {'_id': 1}}
+        ]
 
 
 class AcademicsProgramsModel:
     """Model for academics_programs collection"""
+
+    _collection = None
     
-    @staticmethod
-    def get_collection():
-        return get_collection('academics_programs')
+    @classmethod
+    def get_collection(cls):
+        if cls._collection is None:
+            cls._collection = get_collection('academics_programs')
+        return cls._collection
     
     @staticmethod
     def find_by_school_and_year(school_id, year=2023):
@@ -327,48 +1115,94 @@ class AcademicsProgramsModel:
             {'school_id': school_id, 'year': year},
             PROGRAMS_PROJECTION
         )
+
+    @staticmethod
+    def find_by_schools_and_year(school_ids, year=2023):
+        """Get programs for several schools, keyed by school_id"""
+        return index_by_school(
+            AcademicsProgramsModel.get_collection(), PROGRAMS_PROJECTION, school_ids, year
+        )
     
     @staticmethod
+    @cache.memoize(3600)
     def find_schools_with_major(major_field, threshold=0.05, year=2023):
-        """Find schools offering a specific major above threshold"""
-        query = {
-            'year': year,
-            f'academics.program_percentage.{major_field}': {'$gte': threshold}
-        }
-        return list(AcademicsProgramsModel.get_collection().find(
-            query,
-            {'school_id': 1, f'academics.program_percentage.{major_field}': 1}
-        ))
+        """
+        Find schools offering a specific major (a MAJOR_NAMES key) above threshold
+        Returns the matching school_ids as a plain list (no per-document envelope);
+        memoized per (major, threshold, year) since every major filter resolves through here
+        """
+        if program_shares_ready():
+            query = {
+                'year': year,
+                'program_shares': {'$elemMatch': {'major': major_field, 'pct': {'$gte': threshold}}}
+            }
+        else:
+            query = {
+                'year': year,
+                MAJOR_PERCENTAGE_PATHS[major_field]: {'$gte': threshold}
+            }
+        return AcademicsProgramsModel.get_collection().distinct('school_id', query)
 
 
 class ProgramsFieldOfStudyModel:
     """Model for programs_field_of_study collection"""
+
+    _collection = None
     
-    @staticmethod
-    def get_collection():
-        return get_collection('programs_field_of_study')
+    @classmethod
+    def get_collection(cls):
+        if cls._collection is None:
+            cls._collection = get_collection('programs_field_of_study')
+        return cls._collection
     
     @staticmethod
+    @cache.memoize(86400)
     def get_program_trends(cip_code, start_year=2015, end_year=2023):
-        """Get earnings trends for a specific program over years"""
+        """
+        Get earnings trends for a specific program over years
+        Served from the pre-computed cache collection; computed online until jobs.py has run
+        """
+        cache_collection = get_collection(PROGRAM_TRENDS_CACHE)
+        docs = cache_collection.find(
+            {'cip_code': cip_code, 'year': {'$gte': start_year, '$lte': end_year}},
+            {'_id': 0, 'cip_code': 0}
+        ).sort('year', 1)
+
+        trends = []
+        for doc in docs:
+            doc['_id'] = doc.pop('year')
+            trends.append(doc)
+        if trends or cache_collection.estimated_document_count():
+            return trends
+
+        # Skip documents without the program, then trim the programs array to the
+        # matching entries before $unwind so only those are expanded
         pipeline = [
             {'$match': {
-                'year': {'$gte': start_year, '$lte': end_year}
+                'year': {'$gte': start_year, '$lte': end_year},
+                'programs.cip_code': cip_code
             }},
-            {'$unwind': '$programs'},
-            {'$match': {'programs.cip_code': cip_code}},
-            {'$group': {
-                '_id': '$year',
-                'avg_1yr_earnings': {'$avg': '$programs.earnings.1_yr_after.median'},
-                'avg_3yr_earnings': {'$avg': '$programs.earnings.3_yrs_after.median'},
-                'avg_5yr_earnings': {'$avg': '$programs.earnings.5_yrs_after.median'},
-                'avg_debt': {'$avg': '$programs.debt.median'},
-                'school_count': {'$sum': 1}
+            {'$project': {
+                'year': 1,
+                'programs': ProgramsFieldOfStudyModel.programs_with_cip_expr(cip_code)
             }},
+            {'$unwind': '$programs'},
+            {'$group': {'_id': '$year', **PROGRAM_TRENDS_ACCUMULATORS}},
             {'$sort': {'_id': 1}}
         ]
         
-        return list(ProgramsFieldOfStudyModel.get_collection().aggregate(pipeline))
+        return list(run_aggregation(get_analytics_collection('programs_field_of_study'), pipeline, 'get_program_trends'))
+    
+    @staticmethod
+    def programs_with_cip_expr(cip_code):
+        """Expression narrowing a document's programs array to one CIP code"""
+        return {
+            '$filter': {
+                'input': '$programs',
+                'as': 'program',
+                'cond': {'$eq': ['$$program.cip_code', cip_code]}
+            }
+        }
     
     @staticmethod
     def get_programs_by_school(school_id, year=2023):
@@ -380,30 +1214,51 @@ class ProgramsFieldOfStudyModel:
     
     @staticmethod
     def compare_programs_across_schools(cip_code, school_ids, year=2023):
-        """Compare a specific program across multiple schools"""
-        pipeline = [
-            {'$match': {
-                'school_id': {'$in': school_ids},
-                'year': year
-            }},
-            {'$unwind': '$programs'},
-            {'$match': {'programs.cip_code': cip_code}},
-            {'$project': {
-                'school_id': 1,
-                'year': 1,
-                'program': '$programs'
-            }}
-        ]
+        """
+        Compare a specific program across multiple schools
+        Each row carries its school's name/city/state, looked up in one batch
+        (never call find_by_id per row)
+        """
+        def fetch(ids):
+            pipeline = [
+                {'$match': {
+                    'school_id': {'$in': ids},
+                    'year': year,
+                    'programs.cip_code': cip_code
+                }},
+                {'$project': {
+                    'school_id': 1,
+                    'year': 1,
+                    'programs': ProgramsFieldOfStudyModel.programs_with_cip_expr(cip_code)
+                }},
+                {'$unwind': '$programs'},
+                {'$project': {
+                    'school_id': 1,
+                    'year': 1,
+                    'program': '$programs'
+                }}
+            ]
+            return list(run_aggregation(ProgramsFieldOfStudyModel.get_collection(), pipeline, 'compare_programs_across_schools'))
         
-        return list(ProgramsFieldOfStudyModel.get_collection().aggregate(pipeline))
+        rows = map_chunks(fetch, school_ids)
+
+        row_ids = list({row['school_id'] for row in rows})
+        schools = {s['school_id']: s.get('school') for s in SchoolModel.get_multiple_by_ids(row_ids)}
+        for row in rows:
+            row['school'] = schools.get(row['school_id'])
+        return rows
 
 
 class AdmissionsStudentModel:
     """Model for admissions_student collection"""
+
+    _collection = None
     
-    @staticmethod
-    def get_collection():
-        return get_collection('admissions_student')
+    @classmethod
+    def get_collection(cls):
+        if cls._collection is None:
+            cls._collection = get_collection('admissions_student')
+        return cls._collection
     
     @staticmethod
     def find_by_school_and_year(school_id, year=2023):
@@ -2,20 +2,133 @@
 API routes for aggregations, analytics, and geographic visualizations
 FIXED VERSION - Updated to match actual MongoDB structure
 """
-from flask import Blueprint, request, jsonify
-from models import CostsAidCompletionModel, SchoolModel
-from bson import json_util
-import json
+import os
+from functools import lru_cache
+from flask import Blueprint, current_app, g, request, jsonify
+from werkzeug.exceptions import NotFound
+from models import (CostsAidCompletionModel, AcademicsProgramsModel,
+                    COMPLETION_GROUP_FIELDS, MAJOR_NAMES, COST_VS_EARNINGS_PROJECTION,
+                    roi_cache_ready)
+from cache import cache, is_ok_response, AGGREGATION_TIMEOUT
 
 aggregations_bp = Blueprint('aggregations', __name__, url_prefix='/api/aggregations')
 
 
-def parse_json(data):
-    """Helper to parse MongoDB ObjectId and other BSON types"""
-    return json.loads(json_util.dumps(data))
+def invalid_int_arg(*names):
+    """First of `names` given in the query string but not an integer (None if all parse)"""
+    for name in names:
+        if request.args.get(name) and request.args.get(name, type=int) is None:
+            return name
+    return None
+
+
+def school_filter_match(year, state=None, ownership=None, major=None, conditions=None):
+    """
+    Initial $match for a year, narrowed to schools in `state`/`ownership` and,
+    when `major` is given, to schools with at least 5% of degrees in that major.
+    See CostsAidCompletionModel.school_conditions for how state/ownership apply.
+    `conditions` adds further filters on local fields.
+    """
+    match = {
+        'year': year,
+        **(conditions or {}),
+        **CostsAidCompletionModel.school_conditions(state, ownership)
+    }
+
+    if major:
+        major_ids = set(AcademicsProgramsModel.find_schools_with_major(major, 0.05, year))
+        if 'school_id' in match:
+            major_ids &= set(match['school_id']['$in'])
+        match['school_id'] = {'$in': list(major_ids)}
+    return {'$match': match}
+
+
+# Stage builders below are cached: their output depends only on their arguments,
+# so each shape is built once and shared by every request (splat it, don't mutate it)
+
+@lru_cache(maxsize=None)
+def roi_top_stages():
+    """
+    Keep the top 100 rows by 10-year ROI, ranked on the raw cost/earnings fields
+    before school fields are joined or the output is shaped
+    """
+    return [
+        *CostsAidCompletionModel.roi_metric_stages(),
+        {'$sort': {'roi_10yr': -1}},
+        {'$limit': 100}
+    ]
+
+
+@lru_cache(maxsize=None)
+def roi_projection_stages():
+    """Shape the rows ranked by roi_top_stages (with school fields) into ROI results"""
+    return [{'$project': CostsAidCompletionModel.roi_output_projection()}]
+
+
+def roi_stages():
+    """ROI results for rows kept by usable_cost_and_earnings that already carry school fields"""
+    return [*roi_top_stages(), *roi_projection_stages()]
+
+
+@lru_cache(maxsize=None)
+def cost_vs_earnings_stages(limit):
+    """Cost vs earnings scatter points for rows kept by usable_cost_and_earnings"""
+    cost_expr = CostsAidCompletionModel.get_cost_field_expr()
+    return [
+        {
+            '$project': {
+                'school_id': 1,
+                'school_name': '$school_name',
+                'state': '$school_state',
+                'ownership': '$school_ownership',
+                'cost': cost_expr,
+                'earnings': '$earnings.10_yrs_after_entry.median',
+                'completion_rate': '$completion.completion_rate_4yr_150nt',
+                'size': '$school_size'
+            }
+        },
+        {'$limit': limit}
+    ]
+
+
+@aggregations_bp.route('/debug/explain/<path:target>', methods=['GET'])
+def explain_endpoint(target):
+    """
+    Run an aggregations endpoint uncached and return the executionStats explain of
+    every pipeline it ran (enabled with ENABLE_EXPLAIN=true)
+    e.g. /api/aggregations/debug/explain/roi?state=CA&year=2022
+    Results served by memoized model helpers or pre-computed collections run no pipeline.
+    """
+    if os.getenv('ENABLE_EXPLAIN', 'false').lower() != 'true':
+        return jsonify({'error': 'Endpoint not found'}), 404
+
+    try:
+        endpoint, view_args = current_app.url_map.bind(request.host).match(
+            f'{aggregations_bp.url_prefix}/{target}', method='GET'
+        )
+    except NotFound:
+        return jsonify({'error': f'Unknown endpoint: {target}'}), 404
+    if endpoint == request.endpoint:
+        return jsonify({'error': 'Cannot explain the explain endpoint'}), 400
+
+    try:
+        view = current_app.view_functions[endpoint]
+        g.explains = []
+        # Skip the response cache so the pipelines actually run
+        getattr(view, 'uncached', view)(**view_args)
+        
+        return jsonify({
+            'endpoint': endpoint,
+            'args': request.args.to_dict(),
+            'explains': g.explains
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 
 @aggregations_bp.route('/state', methods=['GET'])
+@cache.cached(timeout=AGGREGATION_TIMEOUT, query_string=True, response_filter=is_ok_response)
 def get_state_aggregations():
     """Get state-level statistics for geographic visualization"""
     try:
@@ -24,7 +137,7 @@ def get_state_aggregations():
         
         return jsonify({
             'state': state or 'all',
-            'aggregations': parse_json(aggregations)
+            'aggregations': aggregations
         }), 200
         
     except Exception as e:
@@ -32,6 +145,7 @@ def get_state_aggregations():
 
 
 @aggregations_bp.route('/roi', methods=['GET'])
+@cache.cached(timeout=AGGREGATION_TIMEOUT, query_string=True, response_filter=is_ok_response)
 def calculate_roi():
     """
     Calculate ROI (Return on Investment) metrics
@@ -44,151 +158,42 @@ def calculate_roi():
     """
     try:
         state = request.args.get('state')
-        ownership = request.args.get('ownership')
+        ownership = request.args.get('ownership', type=int)
         major = request.args.get('major')
-        year = int(request.args.get('year', 2023))
-        
-        # Build match conditions
-        match_conditions = {'year': year}
-        
-        pipeline = [
-            {'$match': match_conditions}
-        ]
-        
-        # Add school info lookup
-        pipeline.append({
-            '$lookup': {
-                'from': 'schools',
-                'localField': 'school_id',
-                'foreignField': 'school_id',
-                'as': 'school_info'
-            }
-        })
-        
-        pipeline.append({'$unwind': '$school_info'})
-        
-        # Apply filters
-        school_filters = {}
-        if state:
-            school_filters['school_info.school.state'] = state
-        if ownership:
-            school_filters['school_info.school.ownership'] = int(ownership)
-        
-        if school_filters:
-            pipeline.append({'$match': school_filters})
-        
-        # If major filter is specified, also lookup academics
-        if major:
-            pipeline.extend([
-                {
-                    '$lookup': {
-                        'from': 'academics_programs',
-                        'localField': 'school_id',
-                        'foreignField': 'school_id',
-                        'as': 'academics'
-                    }
-                },
-                {'$unwind': '$academics'},
-                {'$match': {
-                    'academics.year': year,
-                    f'academics.academics.program_percentage.{major}': {'$gte': 0.05}
-                }}
-            ])
-        
-        # Calculate ROI metrics - using flexible cost field access
-        cost_expr = CostsAidCompletionModel.get_cost_field_expr()
-        
-        pipeline.extend([
-            {
-                '$project': {
-                    'school_id': 1,
-                    'school_name': '$school_info.school.name',
-                    'state': '$school_info.school.state',
-                    'ownership': '$school_info.school.ownership',
-                    'cost': cost_expr,
-                    'earnings_6yr': '$earnings.6_yrs_after_entry.median',
-                    'earnings_10yr': '$earnings.10_yrs_after_entry.median',
-                    'completion_rate': '$completion.completion_rate_4yr_150nt',
-                    'median_debt': {
-                        '$ifNull': [
-                            '$aid.median_debt.completers.overall',
-                            '$aid.median_debt'
-                        ]
-                    },
-                    # ROI = (10yr earnings * 10 - 4 * cost) / (4 * cost)
-                    'roi_10yr': {
-                        '$cond': {
-                            'if': {
-                                '$and': [
-                                    {'$gt': ['$earnings.10_yrs_after_entry.median', 0]},
-                                    {'$gt': [cost_expr, 0]}
-                                ]
-                            },
-                            'then': {
-                                '$divide': [
-                                    {
-                                        '$subtract': [
-                                            {'$multiply': ['$earnings.10_yrs_after_entry.median', 10]},
-                                            {'$multiply': [cost_expr, 4]}
-                                        ]
-                                    },
-                                    {'$multiply': [cost_expr, 4]}
-                                ]
-                            },
-                            'else': None
-                        }
-                    },
-                    # Simple payback period: (4 * cost) / annual_earnings
-                    'payback_years': {
-                        '$cond': {
-                            'if': {
-                                '$and': [
-                                    {'$gt': ['$earnings.10_yrs_after_entry.median', 0]},
-                                    {'$gt': [cost_expr, 0]}
-                                ]
-                            },
-                            'then': {
-                                '$divide': [
-                                    {'$multiply': [cost_expr, 4]},
-                                    '$earnings.10_yrs_after_entry.median'
-                                ]
-                            },
-                            'else': None
-                        }
-                    }
-                }
-            },
-            # Filter out records with missing data
-            {
-                '$match': {
-                    'cost': {'$ne': None, '$gt': 0},
-                    'earnings_10yr': {'$ne': None, '$gt': 0},
-                    'roi_10yr': {'$ne': None}
-                }
-            },
-            # Final projection
-            {
-                '$project': {
-                    'school_id': 1,
-                    'school_name': 1,
-                    'state': 1,
-                    'ownership': 1,
-                    'cost': {'$round': ['$cost', 0]},
-                    'earnings_10yr': {'$round': ['$earnings_10yr', 0]},
-                    'completion_rate': {'$round': ['$completion_rate', 4]},
-                    'median_debt': {'$round': ['$median_debt', 0]},
-                    'roi_10yr': {'$round': ['$roi_10yr', 2]},
-                    'payback_years': {'$round': ['$payback_years', 1]}
-                }
-            },
-            {'$sort': {'roi_10yr': -1}},
-            {'$limit': 100}
-        ])
-        
-        results = list(CostsAidCompletionModel.get_collection().aggregate(pipeline))
+        year = request.args.get('year', 2023, type=int)
+        
+        invalid = invalid_int_arg('ownership', 'year')
+        if invalid:
+            return jsonify({'error': f'Invalid {invalid} parameter'}), 400
+        if major and major not in MAJOR_NAMES:
+            return jsonify({'error': 'Invalid major parameter'}), 400
+        
+        if roi_cache_ready():
+            # Per-school ROI rows are pre-computed by jobs.py
+            results = CostsAidCompletionModel.find_roi_rows(year, state, ownership, major)
+        else:
+            # Filter on year, school state/ownership/major and usable cost/earnings
+            pipeline = [
+                school_filter_match(
+                    year, state, ownership, major=major,
+                    conditions=CostsAidCompletionModel.usable_cost_and_earnings()
+                )
+            ]
+            
+            # Rank and cut to the top 100 first, so only those rows get school fields and shaping
+            pipeline.extend(roi_top_stages())
+            
+            # School name/state/ownership (denormalized; joined only before jobs.py has run)
+            pipeline.extend(CostsAidCompletionModel.school_field_stages(
+                ['school_name', 'school_state', 'school_ownership']
+            ))
+            
+            pipeline.extend(roi_projection_stages())
+            
+            results = CostsAidCompletionModel.aggregate(pipeline, 'calculate_roi')
         
         return jsonify({
-            'roi_data': parse_json(results),
+            'roi_data': results,
             'count': len(results),
             'filters': {
                 'state': state,
@@ -206,83 +211,32 @@ def calculate_roi():
 
 
 @aggregations_bp.route('/earnings-distribution', methods=['GET'])
+@cache.cached(timeout=AGGREGATION_TIMEOUT, query_string=True, response_filter=is_ok_response)
 def get_earnings_distribution():
     """Get earnings distribution across schools"""
     try:
-        year = int(request.args.get('year', 2023))
+        year = request.args.get('year', 2023, type=int)
         major = request.args.get('major')
         state = request.args.get('state')
         
-        pipeline = [
-            {'$match': {'year': year}},
-            {
-                '$lookup': {
-                    'from': 'schools',
-                    'localField': 'school_id',
-                    'foreignField': 'school_id',
-                    'as': 'school_info'
-                }
-            },
-            {'$unwind': '$school_info'}
-        ]
-        
-        # Apply filters
-        filters = {}
-        if state:
-            filters['school_info.school.state'] = state
-        
-        if filters:
-            pipeline.append({'$match': filters})
-        
-        # If major filter
-        if major:
-            pipeline.extend([
-                {
-                    '$lookup': {
-                        'from': 'academics_programs',
-                        'localField': 'school_id',
-                        'foreignField': 'school_id',
-                        'as': 'academics'
-                    }
-                },
-                {'$unwind': '$academics'},
-                {'$match': {
-                    'academics.year': year,
-                    f'academics.academics.program_percentage.{major}': {'$gte': 0.05}
-                }}
-            ])
-        
-        # Group into earnings buckets
-        pipeline.extend([
-            {
-                '$match': {
-                    'earnings.10_yrs_after_entry.median': {'$ne': None, '$gt': 0}
-                }
-            },
-            {
-                '$bucket': {
-                    'groupBy': '$earnings.10_yrs_after_entry.median',
-                    'boundaries': [0, 30000, 40000, 50000, 60000, 70000, 80000, 100000, 150000, 200000, 500000],
-                    'default': 'other',
-                    'output': {
-                        'count': {'$sum': 1},
-                        'avg_earnings': {'$avg': '$earnings.10_yrs_after_entry.median'},
-                        'schools': {
-                            '$push': {
-                                'school_id': '$school_id',
-                                'name': '$school_info.school.name',
-                                'earnings': '$earnings.10_yrs_after_entry.median'
-                            }
-                        }
-                    }
-                }
-            }
-        ])
-        
-        distribution = list(CostsAidCompletionModel.get_collection().aggregate(pipeline))
+        if invalid_int_arg('year'):
+            return jsonify({'error': 'Invalid year parameter'}), 400
+        if major and major not in MAJOR_NAMES:
+            return jsonify({'error': 'Invalid major parameter'}), 400
+        
+        if state or major:
+            # Group into earnings buckets
+            pipeline = CostsAidCompletionModel.earnings_distribution_pipeline(
+                school_filter_match(year, state, major=major),
+                CostsAidCompletionModel.school_field_stages(['school_name'])
+            )
+            distribution = CostsAidCompletionModel.aggregate(pipeline, 'get_earnings_distribution')
+        else:
+            # The unfiltered distribution is pre-computed by jobs.py
+            distribution = CostsAidCompletionModel.get_earnings_distribution(year)
         
         return jsonify({
-            'distribution': parse_json(distribution),
+            'distribution': distribution,
             'year': year,
             'filters': {
                 'major': major,
@@ -295,65 +249,45 @@ def get_earnings_distribution():
 
 
 @aggregations_bp.route('/cost-vs-earnings', methods=['GET'])
+@cache.cached(timeout=AGGREGATION_TIMEOUT, query_string=True, response_filter=is_ok_response)
 def get_cost_vs_earnings():
     """Get cost vs earnings scatter plot data"""
     try:
-        year = int(request.args.get('year', 2023))
+        year = request.args.get('year', 2023, type=int)
         state = request.args.get('state')
-        ownership = request.args.get('ownership')
-        limit = min(int(request.args.get('limit', 200)), 500)
-        
-        cost_expr = CostsAidCompletionModel.get_cost_field_expr()
-        
-        pipeline = [
-            {'$match': {'year': year}},
-            {
-                '$lookup': {
-                    'from': 'schools',
-                    'localField': 'school_id',
-                    'foreignField': 'school_id',
-                    'as': 'school_info'
-                }
-            },
-            {'$unwind': '$school_info'}
-        ]
-        
-        # Apply filters
-        filters = {}
-        if state:
-            filters['school_info.school.state'] = state
-        if ownership:
-            filters['school_info.school.ownership'] = int(ownership)
-        
-        if filters:
-            pipeline.append({'$match': filters})
-        
-        pipeline.extend([
-            {
-                '$project': {
-                    'school_id': 1,
-                    'school_name': '$school_info.school.name',
-                    'state': '$school_info.school.state',
-                    'ownership': '$school_info.school.ownership',
-                    'cost': cost_expr,
-                    'earnings': '$earnings.10_yrs_after_entry.median',
-                    'completion_rate': '$completion.completion_rate_4yr_150nt',
-                    'size': '$school_info.school.student.size'
-                }
-            },
-            {
-                '$match': {
-                    'cost': {'$ne': None, '$gt': 0},
-                    'earnings': {'$ne': None, '$gt': 0}
-                }
-            },
-            {'$limit': limit}
-        ])
-        
-        data = list(CostsAidCompletionModel.get_collection().aggregate(pipeline))
+        ownership = request.args.get('ownership', type=int)
+        limit = request.args.get('limit', 200, type=int)
+        
+        invalid = invalid_int_arg('year', 'ownership', 'limit')
+        if invalid:
+            return jsonify({'error': f'Invalid {invalid} parameter'}), 400
+        if limit < 1:
+            return jsonify({'error': 'Invalid limit parameter'}), 400
+        limit = min(limit, 500)
+        
+        if roi_cache_ready():
+            # Same pre-computed rows as /roi, unranked
+            data = CostsAidCompletionModel.find_roi_rows(
+                year, state, ownership, limit=limit,
+                projection=COST_VS_EARNINGS_PROJECTION, by_roi=False
+            )
+        else:
+            # Cut to `limit` rows before the (pre-job) schools join, so at most
+            # `limit` indexed school_id lookups run instead of one per matching row
+            pipeline = [
+                school_filter_match(year, state, ownership, conditions=CostsAidCompletionModel.usable_cost_and_earnings()),
+                {'$limit': limit},
+                *CostsAidCompletionModel.school_field_stages(
+                    ['school_name', 'school_state', 'school_ownership', 'school_size']
+                )
+            ]
+            
+            pipeline.extend(cost_vs_earnings_stages(limit))
+            
+            data = CostsAidCompletionModel.aggregate(pipeline, 'get_cost_vs_earnings')
         
         return jsonify({
-            'data': parse_json(data),
+            'data': data,
             'count': len(data),
             'year': year
         }), 200
@@ -366,116 +300,149 @@ def get_cost_vs_earnings():
 
 
 @aggregations_bp.route('/completion-rates', methods=['GET'])
+@cache.cached(timeout=AGGREGATION_TIMEOUT, query_string=True, response_filter=is_ok_response)
 def get_completion_rates():
     """Get completion rate statistics"""
     try:
         group_by = request.args.get('group_by', 'state')
-        year = int(request.args.get('year', 2023))
+        year = request.args.get('year', 2023, type=int)
+        
+        if group_by not in COMPLETION_GROUP_FIELDS:
+            return jsonify({'error': 'Invalid group_by parameter'}), 400
+        if invalid_int_arg('year'):
+            return jsonify({'error': 'Invalid year parameter'}), 400
+        
+        results = CostsAidCompletionModel.get_completion_rates(year, group_by)
         
-        # Map group_by to field path
-        group_field_map = {
-            'state': '$school_info.school.state',
-            'ownership': '$school_info.school.ownership',
-            'degree_level': '$school_info.school.degrees_awarded.predominant'
-        }
+        return jsonify({
+            'data': results,
+            'group_by': group_by,
+            'year': year
+        }), 200
         
-        if group_by not in group_field_map:
+    except Exception as e:
+        import traceback
+        print(f"Error in completion-rates: {e}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@aggregations_bp.route('/dashboard', methods=['GET'])
+@cache.cached(timeout=AGGREGATION_TIMEOUT, query_string=True, response_filter=is_ok_response)
+def get_dashboard():
+    """
+    ROI, earnings distribution, cost vs earnings and completion rates in one call
+    The year/school filter and school fields run once; $facet branches the rows
+    into the four analyses instead of four separate scans.
+    
+    Query parameters:
+    - state, ownership, major: Filters applied to every section (optional)
+    - group_by: Completion rate grouping (state, ownership, degree_level; default state)
+    - limit: Cost vs earnings points (default 200, max 500)
+    - year: Year for data (default 2023)
+    """
+    try:
+        year = request.args.get('year', 2023, type=int)
+        state = request.args.get('state')
+        ownership = request.args.get('ownership', type=int)
+        major = request.args.get('major')
+        group_by = request.args.get('group_by', 'state')
+        limit = request.args.get('limit', 200, type=int)
+        
+        if group_by not in COMPLETION_GROUP_FIELDS:
             return jsonify({'error': 'Invalid group_by parameter'}), 400
+        invalid = invalid_int_arg('year', 'ownership', 'limit')
+        if invalid:
+            return jsonify({'error': f'Invalid {invalid} parameter'}), 400
+        if limit < 1:
+            return jsonify({'error': 'Invalid limit parameter'}), 400
+        limit = min(limit, 500)
+        if major and major not in MAJOR_NAMES:
+            return jsonify({'error': 'Invalid major parameter'}), 400
+        
+        usable = {'$match': CostsAidCompletionModel.usable_cost_and_earnings()}
+        school_fields = {'school_name', 'school_state', 'school_ownership', 'school_size',
+                         COMPLETION_GROUP_FIELDS[group_by]}
         
         pipeline = [
-            {'$match': {'year': year}},
-            {
-                '$lookup': {
-                    'from': 'schools',
-                    'localField': 'school_id',
-                    'foreignField': 'school_id',
-                    'as': 'school_info'
-                }
-            },
-            {'$unwind': '$school_info'},
+            school_filter_match(year, state, ownership, major=major),
+            *CostsAidCompletionModel.school_field_stages(sorted(school_fields)),
             {
-                '$match': {
-                    'completion.completion_rate_4yr_150nt': {'$ne': None}
-                }
-            },
-            {
-                '$group': {
-                    '_id': group_field_map[group_by],
-                    'avg_completion_4yr': {'$avg': '$completion.completion_rate_4yr_150nt'},
-                    'median_completion_4yr': {
-                        '$percentile': {
-                            'input': '$completion.completion_rate_4yr_150nt',
-                            'p': [0.5],
-                            'method': 'approximate'
-                        }
-                    },
-                    'min_completion': {'$min': '$completion.completion_rate_4yr_150nt'},
-                    'max_completion': {'$max': '$completion.completion_rate_4yr_150nt'},
-                    'school_count': {'$sum': 1}
+                '$facet': {
+                    'roi_data': [usable, *roi_stages()],
+                    'distribution': CostsAidCompletionModel.earnings_bucket_stages(),
+                    'cost_vs_earnings': [usable, *cost_vs_earnings_stages(limit)],
+                    'completion_rates': CostsAidCompletionModel.completion_group_stages(group_by)
                 }
-            },
-            {'$sort': {'_id': 1}}
+            }
         ]
         
-        results = list(CostsAidCompletionModel.get_collection().aggregate(pipeline, allowDiskUse=True))
+        data = next(iter(CostsAidCompletionModel.aggregate(pipeline, 'get_dashboard')), {})
         
         return jsonify({
-            'data': parse_json(results),
+            **data,
             'group_by': group_by,
-            'year': year
+            'year': year,
+            'filters': {
+                'state': state,
+                'ownership': ownership,
+                'major': major
+            }
         }), 200
         
     except Exception as e:
         import traceback
-        print(f"Error in completion-rates: {e}")
+        print(f"Error in dashboard: {e}")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
 @aggregations_bp.route('/summary-stats', methods=['GET'])
+@cache.cached(timeout=AGGREGATION_TIMEOUT, query_string=True, response_filter=is_ok_response)
 def get_summary_stats():
     """Get summary statistics for the dataset"""
     try:
-        year = int(request.args.get('year', 2023))
+        year = request.args.get('year', 2023, type=int)
+        
+        if invalid_int_arg('year'):
+            return jsonify({'error': 'Invalid year parameter'}), 400
         
         cost_expr = CostsAidCompletionModel.get_cost_field_expr()
         
         pipeline = [
             {'$match': {'year': year}},
+            # Resolve the cost fallback chain and nested paths once per row
+            {
+                '$project': {
+                    '_id': 0,
+                    'cost': cost_expr,
+                    'earnings': '$earnings.10_yrs_after_entry.median',
+                    'completion': '$completion.completion_rate_4yr_150nt',
+                    'debt': '$aid.median_debt.completers.overall'
+                }
+            },
             {
                 '$group': {
                     '_id': None,
                     'total_schools': {'$sum': 1},
                     'schools_with_earnings': {
-                        '$sum': {
-                            '$cond': [
-                                {'$gt': ['$earnings.10_yrs_after_entry.median', 0]},
-                                1,
-                                0
-                            ]
-                        }
+                        '$sum': {'$cond': [{'$gt': ['$earnings', 0]}, 1, 0]}
                     },
                     'schools_with_cost': {
-                        '$sum': {
-                            '$cond': [
-                                {'$gt': [cost_expr, 0]},
-                                1,
-                                0
-                            ]
-                        }
+                        '$sum': {'$cond': [{'$gt': ['$cost', 0]}, 1, 0]}
                     },
-                    'avg_cost': {'$avg': cost_expr},
-                    'avg_earnings': {'$avg': '$earnings.10_yrs_after_entry.median'},
-                    'avg_completion': {'$avg': '$completion.completion_rate_4yr_150nt'},
-                    'avg_debt': {'$avg': '$aid.median_debt.completers.overall'}
+                    'avg_cost': {'$avg': '$cost'},
+                    'avg_earnings': {'$avg': '$earnings'},
+                    'avg_completion': {'$avg': '$completion'},
+                    'avg_debt': {'$avg': '$debt'}
                 }
             }
         ]
         
-        results = list(CostsAidCompletionModel.get_collection().aggregate(pipeline))
+        summary = next(iter(CostsAidCompletionModel.aggregate(pipeline, 'get_summary_stats')), {})
         
         return jsonify({
-            'summary': parse_json(results[0] if results else {}),
+            'summary': summary,
             'year': year
         }), 200
         
@@ -2,16 +2,13 @@
 API routes for programs and visualization endpoints
 """
 from flask import Blueprint, request, jsonify
-from models import ProgramsFieldOfStudyModel, AcademicsProgramsModel
-from bson import json_util
-import json
-
-programs_bp = Blueprint('programs', __name__, url_prefix='/api/programs')
+from models import ProgramsFieldOfStudyModel, AcademicsProgramsModel, MAJOR_NAMES
+from cache import cache, is_ok_response, REFERENCE_TIMEOUT
+import logging
 
+logger = logging.getLogger(__name__)
 
-def parse_json(data):
-    """Helper to parse MongoDB ObjectId and other BSON types"""
-    return json.loads(json_util.dumps(data))
+programs_bp = Blueprint('programs', __name__, url_prefix='/api/programs')
 
 
 @programs_bp.route('/trends', methods=['GET'])
@@ -37,7 +34,7 @@ def get_program_trends():
         
         return jsonify({
             'cip_code': cip_code,
-            'trends': parse_json(trends),
+            'trends': trends,
             'years': f'{start_year}-{end_year}'
         }), 200
         
@@ -74,7 +71,7 @@ def compare_programs():
         
         return jsonify({
             'cip_code': cip_code,
-            'comparison': parse_json(comparison),
+            'comparison': comparison,
             'year': year
         }), 200
         
@@ -83,6 +80,7 @@ def compare_programs():
 
 
 @programs_bp.route('/majors', methods=['GET'])
+@cache.cached(timeout=REFERENCE_TIMEOUT, query_string=True, response_filter=is_ok_response)
 def get_available_majors():
     """
     Get list of available majors/programs
@@ -99,14 +97,14 @@ def get_available_majors():
             {'academics.program_percentage': 1}
         )
         
-        print(f"DEBUG: Sample document for year {year}:")
-        print(f"  - Document exists: {sample is not None}")
-        if sample:
-            print(f"  - Has 'academics' field: {'academics' in sample}")
-            if 'academics' in sample:
-                print(f"  - Has 'program_percentage': {'program_percentage' in sample['academics']}")
-                if 'program_percentage' in sample['academics']:
-                    print(f"  - Number of majors: {len(sample['academics']['program_percentage'])}")
+        # Debug output only when enabled, so normal requests skip the formatting
+        if logger.isEnabledFor(logging.DEBUG):
+            academics = (sample or {}).get('academics', {})
+            logger.debug(
+                "majors sample year=%s exists=%s has_academics=%s majors=%s",
+                year, sample is not None, 'academics' in (sample or {}),
+                len(academics.get('program_percentage', {}))
+            )
         
         if not sample:
             return jsonify({
@@ -125,61 +123,20 @@ def get_available_majors():
         # Get all major field codes
         majors_dict = sample['academics']['program_percentage']
         
-        # Create friendly names mapping
-        major_mapping = {
-            'agriculture': 'Agriculture',
-            'resources': 'Natural Resources',
-            'architecture': 'Architecture',
-            'ethnic_cultural_gender': 'Ethnic, Cultural & Gender Studies',
-            'communication': 'Communication',
-            'communications_technology': 'Communications Technology',
-            'computer': 'Computer Science',
-            'personal_culinary': 'Personal & Culinary Services',
-            'education': 'Education',
-            'engineering': 'Engineering',
-            'engineering_technology': 'Engineering Technology',
-            'language': 'Foreign Languages',
-            'family_consumer_science': 'Family & Consumer Sciences',
-            'legal': 'Legal Studies',
-            'english': 'English',
-            'humanities': 'Liberal Arts & Humanities',
-            'library': 'Library Science',
-            'biological': 'Biological Sciences',
-            'mathematics': 'Mathematics',
-            'military': 'Military Science',
-            'multidiscipline': 'Multidisciplinary Studies',
-            'parks_recreation_fitness': 'Parks, Recreation & Fitness',
-            'philosophy_religious': 'Philosophy & Religious Studies',
-            'theology_religious_vocation': 'Theology & Religious Vocations',
-            'physical_science': 'Physical Sciences',
-            'science_technology': 'Science Technology',
-            'psychology': 'Psychology',
-            'security_law_enforcement': 'Security & Law Enforcement',
-            'public_administration_social_service': 'Public Administration',
-            'social_science': 'Social Sciences',
-            'construction': 'Construction Trades',
-            'mechanic_repair_technology': 'Mechanic & Repair Technology',
-            'precision_production': 'Precision Production',
-            'transportation': 'Transportation',
-            'visual_performing': 'Visual & Performing Arts',
-            'health': 'Health Professions',
-            'business_marketing': 'Business & Marketing',
-            'history': 'History'
-        }
-        
-        # Create list of majors with friendly names
+        # Create list of majors with friendly names (only those the filters accept)
         majors_list = [
             {
                 'field_code': major_code,
-                'field_name': major_mapping.get(major_code, major_code.replace('_', ' ').title())
+                'field_name': MAJOR_NAMES[major_code]
             }
             for major_code in majors_dict.keys()
+            if major_code in MAJOR_NAMES
         ]
         
         # Sort by field name for better UX
         majors_list.sort(key=lambda x: x['field_name'])
         
-        print(f"DEBUG: Returning {len(majors_list)} majors")
+        logger.debug("Returning %d majors", len(majors_list))
         
         return jsonify({
             'majors': majors_list,
@@ -197,6 +154,7 @@ def get_available_majors():
         }), 500
 
 @programs_bp.route('/cip-codes', methods=['GET'])
+@cache.cached(timeout=REFERENCE_TIMEOUT, response_filter=is_ok_response)
 def get_cip_codes():
     """
     Get list of common CIP codes with descriptions
@@ -254,9 +212,9 @@ def get_school_programs(school_id):
         return jsonify({
             'school_id': school_id,
             'year': year,
-            'program_percentages': parse_json(programs.get('program_percentage', {})),
-            'program_details': parse_json(programs.get('program', {})),
-            'field_of_study_data': parse_json(field_of_study.get('programs', []) if field_of_study else [])
+            'program_percentages': programs.get('program_percentage', {}),
+            'program_details': programs.get('program', {}),
+            'field_of_study_data': field_of_study.get('programs', []) if field_of_study else []
         }), 200
         
     except Exception as e:
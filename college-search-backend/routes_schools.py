@@ -3,16 +3,36 @@ API routes for schools-related endpoints
 FIXED VERSION - Updated to match actual MongoDB structure
 """
 from flask import Blueprint, request, jsonify
-from models import SchoolModel, AcademicsProgramsModel, CostsAidCompletionModel
-from bson import json_util
+from models import SchoolModel, AcademicsProgramsModel, CostsAidCompletionModel, MAJOR_NAMES
+from cache import cache, is_ok_response, REFERENCE_TIMEOUT
+import base64
+import binascii
 import json
 
 schools_bp = Blueprint('schools', __name__, url_prefix='/api/schools')
 
 
-def parse_json(data):
-    """Helper to parse MongoDB ObjectId and other BSON types"""
-    return json.loads(json_util.dumps(data))
+def encode_cursor(cursor):
+    """Encode a (sort value, school_id) keyset cursor as an opaque URL-safe token"""
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def decode_cursor(token):
+    """
+    Decode a token produced by encode_cursor back into a (sort value, school_id) tuple
+    Returns None for anything encode_cursor could not have produced
+    """
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, ValueError, TypeError, AttributeError):
+        # json.JSONDecodeError and UnicodeDecodeError are ValueErrors
+        return None
+    if not isinstance(cursor, list) or len(cursor) != 2:
+        return None
+    value, school_id = cursor
+    return value, school_id
 
 
 def _merge_costs_into_basic_info(basic_info, costs):
@@ -118,6 +138,10 @@ def filter_schools():
             
             if request.args.get('ownership'):
                 filters['ownership'] = int(request.args.get('ownership'))
+
+            for bound in ('cost_min', 'cost_max', 'earnings_min', 'earnings_max'):
+                if request.args.get(bound):
+                    filters[bound] = float(request.args.get(bound))
             
             if request.args.get('sort_by'):
                 filters['sort_by'] = request.args.get('sort_by')
@@ -129,15 +153,22 @@ def filter_schools():
         page = int(request.args.get('page', filters.get('page', 1)))
         limit = min(int(request.args.get('limit', filters.get('limit', 20))), 100)
         skip = (page - 1) * limit
+
+        # Keyset pagination: seek past the previous page instead of skipping
+        cursor = request.args.get('cursor', filters.get('cursor'))
+        after = decode_cursor(cursor) if cursor else None
+        if cursor and after is None:
+            return jsonify({'error': 'Invalid cursor parameter'}), 400
         
         # Check if major filter is requested
         major = request.args.get('major', filters.get('major'))
+        if major and major not in MAJOR_NAMES:
+            return jsonify({'error': 'Invalid major parameter'}), 400
         
         if major:
             # First, find schools offering this major
             major_threshold = float(request.args.get('major_threshold', filters.get('major_threshold', 0.05)))
-            schools_with_major = AcademicsProgramsModel.find_schools_with_major(major, major_threshold)
-            school_ids = [s['school_id'] for s in schools_with_major]
+            school_ids = AcademicsProgramsModel.find_schools_with_major(major, major_threshold)
             
             # Then apply other filters only to those schools
             filters['school_ids'] = school_ids
@@ -153,13 +184,14 @@ def filter_schools():
                 }), 200
         
         # Get filtered results
-        result = SchoolModel.filter_schools(filters, skip=skip, limit=limit)
+        result = SchoolModel.filter_schools(filters, skip=skip, limit=limit, after=after)
         
         return jsonify({
-            'results': parse_json(result['results']),
+            'results': result['results'],
             'total': result['total'],
-            'page': result['page'],
-            'limit': result['limit']
+            'page': page,
+            'limit': result['limit'],
+            'next_cursor': encode_cursor(result['next_cursor'])
         }), 200
         
     except Exception as e:
@@ -182,7 +214,7 @@ def search_schools():
         results = SchoolModel.search_by_name(query, limit=limit)
         
         return jsonify({
-            'results': parse_json(results),
+            'results': results,
             'count': len(results)
         }), 200
         
@@ -210,18 +242,21 @@ def compare_schools():
             return jsonify({'error': 'Maximum 10 schools can be compared at once'}), 400
         
         # Get basic school info
-        schools = SchoolModel.get_multiple_by_ids(school_ids)
+        schools = {s['school_id']: s for s in SchoolModel.get_multiple_by_ids(school_ids)}
+
+        # Get additional data for every school in one query per collection
+        programs_by_school = AcademicsProgramsModel.find_by_schools_and_year(school_ids, year)
+        costs_by_school = CostsAidCompletionModel.find_by_schools_and_year(school_ids, year)
         
         comparison_data = []
         for school_id in school_ids:
-            school_info = next((s for s in schools if s['school_id'] == school_id), None)
+            school_info = schools.get(school_id)
             
             if not school_info:
                 continue
             
-            # Get additional data
-            programs = AcademicsProgramsModel.find_by_school_and_year(school_id, year)
-            costs_outcomes = CostsAidCompletionModel.find_by_school_and_year(school_id, year)
+            programs = programs_by_school.get(school_id)
+            costs_outcomes = costs_by_school.get(school_id)
 
             # Merge cost/outcome fields into basic_info.latest
             merged_basic_info = _merge_costs_into_basic_info(school_info, costs_outcomes)
@@ -234,7 +269,7 @@ def compare_schools():
             })
         
         return jsonify({
-            'schools': parse_json(comparison_data),
+            'schools': comparison_data,
             'year': year
         }), 200
         
@@ -285,7 +320,7 @@ def get_school_details(school_id):
             historical_data = CostsAidCompletionModel.get_historical_data(school_id, years=10)
             result['historical_data'] = historical_data
         
-        return jsonify(parse_json(result)), 200
+        return jsonify(result), 200
         
     except Exception as e:
         import traceback
@@ -295,21 +330,14 @@ def get_school_details(school_id):
 
 
 @schools_bp.route('/states', methods=['GET'])
+@cache.cached(timeout=REFERENCE_TIMEOUT, response_filter=is_ok_response)
 def get_states():
     """Get list of all states with school counts"""
     try:
-        pipeline = [
-            {'$group': {
-                '_id': '$school.state',
-                'count': {'$sum': 1}
-            }},
-            {'$sort': {'_id': 1}}
-        ]
-        
-        states = list(SchoolModel.get_collection().aggregate(pipeline))
+        states = SchoolModel.count_by_state()
         
         return jsonify({
-            'states': parse_json(states)
+            'states': states
         }), 200
         
     except Exception as e:
@@ -340,9 +368,9 @@ def debug_school(school_id):
             'school_id': school_id,
             'year': year,
             'raw_data': {
-                'school': parse_json(school),
-                'costs_aid_completion': parse_json(costs),
-                'programs': parse_json(programs)
+                'school': school,
+                'costs_aid_completion': costs,
+                'programs': programs
             }
         }), 200
         
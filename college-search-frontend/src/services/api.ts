@@ -170,6 +170,27 @@ export const aggregationsAPI = {
     });
     return response.data;
   },
+
+  // ROI, earnings distribution, cost vs earnings and completion rates in one request
+  getDashboard: async (filters: {
+    year?: number;
+    state?: string;
+    ownership?: number;
+    major?: string;
+    group_by?: 'state' | 'ownership' | 'degree_level';
+    limit?: number;
+  }): Promise<{
+    roi_data: ROIData[];
+    distribution: EarningsDistribution[];
+    cost_vs_earnings: CostVsEarningsData[];
+    completion_rates: any[];
+    group_by: string;
+    year: number;
+    filters: any;
+  }> => {
+    const response = await api.get('/aggregations/dashboard', { params: filters });
+    return response.data;
+  },
 };
 
 // Analytics API - New comprehensive analytics endpoints